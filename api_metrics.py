@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+               https://developer.cisco.com/docs/licenses
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+__author__ = "Gabriel Zapodeanu TME, ENB"
+__email__ = "gzapodea@cisco.com"
+__version__ = "0.1.0"
+__copyright__ = "Copyright (c) 2023 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.1"
+
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+
+METRICS_JSON_FILE = os.getenv('METRICS_JSON_FILE', 'metrics.json')  # empty to disable the JSON metrics export
+METRICS_PROMETHEUS_FILE = os.getenv('METRICS_PROMETHEUS_FILE', 'metrics.prom')  # empty to disable the Prometheus export
+PROMETHEUS_PREFIX = 'compliance_'
+
+_lock = threading.Lock()
+_api_calls = {}
+_spans = {}
+_counters = {}
+
+
+def record_api_call(endpoint, latency, error=False):
+    """
+    This function will record the latency of one API call. It is safe to call from the worker threads
+    :param endpoint: API endpoint name, for example "github.get_repo_file_content"
+    :param latency: API call latency, in seconds
+    :param error: True if the API call failed
+    :return:
+    """
+    with _lock:
+        metrics = _api_calls.setdefault(endpoint, {'calls': 0, 'errors': 0, 'total_time': 0.0, 'max_time': 0.0})
+        metrics['calls'] += 1
+        metrics['total_time'] += latency
+        metrics['max_time'] = max(metrics['max_time'], latency)
+        if error:
+            metrics['errors'] += 1
+
+
+def record_span(name, duration, error=False):
+    """
+    This function will record the duration of one processing stage. It is safe to call from the worker threads
+    :param name: span name, for example "device_config_compliance.check_configs"
+    :param duration: span duration, in seconds
+    :param error: True if the stage failed
+    :return:
+    """
+    with _lock:
+        metrics = _spans.setdefault(name, {'count': 0, 'errors': 0, 'total_time': 0.0, 'max_time': 0.0})
+        metrics['count'] += 1
+        metrics['total_time'] += duration
+        metrics['max_time'] = max(metrics['max_time'], duration)
+        if error:
+            metrics['errors'] += 1
+
+
+@contextlib.contextmanager
+def span(name):
+    """
+    This function will time the code running in the "with" block, and record it to the span metrics, for example:
+        with api_metrics.span('network_settings_compliance.check_sites'):
+            ...
+    :param name: span name
+    :return: context manager
+    """
+    start_time = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        record_span(name, time.perf_counter() - start_time, error=True)
+        raise
+    record_span(name, time.perf_counter() - start_time)
+
+
+def increment_counter(name, value=1):
+    """
+    This function will increment a counter, for example the number of API call retries
+    :param name: counter name
+    :param value: increment
+    :return:
+    """
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def get_api_metrics():
+    """
+    This function will return the API calls latency metrics for each endpoint
+    :return: {endpoint: {'calls': ..., 'errors': ..., 'total_time': ..., 'avg_time': ..., 'max_time': ...}}
+    """
+    api_metrics = {}
+    with _lock:
+        for endpoint, metrics in _api_calls.items():
+            api_metrics[endpoint] = {'calls': metrics['calls'], 'errors': metrics['errors'],
+                                     'total_time': round(metrics['total_time'], 4),
+                                     'avg_time': round(metrics['total_time'] / metrics['calls'], 4),
+                                     'max_time': round(metrics['max_time'], 4)}
+    return api_metrics
+
+
+def get_span_metrics():
+    """
+    This function will return the processing stages duration metrics for each span
+    :return: {span name: {'count': ..., 'errors': ..., 'total_time': ..., 'avg_time': ..., 'max_time': ...}}
+    """
+    span_metrics = {}
+    with _lock:
+        for name, metrics in _spans.items():
+            span_metrics[name] = {'count': metrics['count'], 'errors': metrics['errors'],
+                                  'total_time': round(metrics['total_time'], 4),
+                                  'avg_time': round(metrics['total_time'] / metrics['count'], 4),
+                                  'max_time': round(metrics['max_time'], 4)}
+    return span_metrics
+
+
+def get_counters():
+    """
+    This function will return the counters
+    :return: {counter name: value}
+    """
+    with _lock:
+        return dict(_counters)
+
+
+def log_api_metrics():
+    """
+    This function will log the API calls metrics for each endpoint, and the counters
+    :return:
+    """
+    for endpoint, metrics in sorted(get_api_metrics().items()):
+        logging.info(' API calls "' + endpoint + '": ' + str(metrics['calls']) + ', errors: ' +
+                     str(metrics['errors']) + ', avg time: ' + str(metrics['avg_time']) + ' sec, max time: ' +
+                     str(metrics['max_time']) + ' sec')
+    for name, metrics in sorted(get_span_metrics().items()):
+        logging.info(' Span "' + name + '": ' + str(metrics['count']) + ', errors: ' + str(metrics['errors']) +
+                     ', total time: ' + str(metrics['total_time']) + ' sec, max time: ' + str(metrics['max_time']) +
+                     ' sec')
+    for name, value in sorted(get_counters().items()):
+        logging.info(' Counter "' + name + '": ' + str(value))
+
+
+def get_metrics():
+    """
+    This function will return all the metrics: the API calls for each endpoint, the spans and the counters
+    :return: {'api_calls': see get_api_metrics, 'spans': see get_span_metrics, 'counters': see get_counters}
+    """
+    return {'api_calls': get_api_metrics(), 'spans': get_span_metrics(), 'counters': get_counters()}
+
+
+def get_prometheus_label(value):
+    """
+    This function will escape a Prometheus label value
+    :param value: label value
+    :return: escaped label value
+    """
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def get_prometheus_metrics():
+    """
+    This function will return all the metrics in the Prometheus text exposition format, for example:
+        compliance_api_calls_total{endpoint="catalyst_center.devices.get_device_list"} 20
+    :return: metrics text
+    """
+    metrics = get_metrics()
+    families = [
+        ('api_calls_total', 'counter', 'Number of API calls', 'api_calls', 'endpoint', 'calls'),
+        ('api_call_errors_total', 'counter', 'Number of failed API calls', 'api_calls', 'endpoint', 'errors'),
+        ('api_call_seconds_total', 'counter', 'Total API calls time', 'api_calls', 'endpoint', 'total_time'),
+        ('api_call_seconds_max', 'gauge', 'Max API call time', 'api_calls', 'endpoint', 'max_time'),
+        ('span_total', 'counter', 'Number of processing stage runs', 'spans', 'span', 'count'),
+        ('span_errors_total', 'counter', 'Number of failed processing stage runs', 'spans', 'span', 'errors'),
+        ('span_seconds_total', 'counter', 'Total processing stage time', 'spans', 'span', 'total_time'),
+        ('span_seconds_max', 'gauge', 'Max processing stage time', 'spans', 'span', 'max_time')
+    ]
+    lines = []
+    for family, metric_type, description, group, label, field in families:
+        if not metrics[group]:
+            continue
+        lines.append('# HELP ' + PROMETHEUS_PREFIX + family + ' ' + description)
+        lines.append('# TYPE ' + PROMETHEUS_PREFIX + family + ' ' + metric_type)
+        for name, values in sorted(metrics[group].items()):
+            lines.append(PROMETHEUS_PREFIX + family + '{' + label + '="' + get_prometheus_label(name) + '"} ' +
+                         str(values[field]))
+    if metrics['counters']:
+        lines.append('# HELP ' + PROMETHEUS_PREFIX + 'counter_total Counters, for example retries and cache hits')
+        lines.append('# TYPE ' + PROMETHEUS_PREFIX + 'counter_total counter')
+        for name, value in sorted(metrics['counters'].items()):
+            lines.append(PROMETHEUS_PREFIX + 'counter_total{name="' + get_prometheus_label(name) + '"} ' + str(value))
+    return '\n'.join(lines) + '\n'
+
+
+def export_metrics(json_file=METRICS_JSON_FILE, prometheus_file=METRICS_PROMETHEUS_FILE):
+    """
+    This function will save all the metrics to a JSON file, and to a Prometheus text format file, for example to be
+    collected by the node exporter textfile collector. The files are saved when the app run completes
+    :param json_file: JSON metrics file name, empty to skip it
+    :param prometheus_file: Prometheus metrics file name, empty to skip it
+    :return:
+    """
+    if json_file:
+        with open(json_file, 'w') as f:
+            f.write(json.dumps(get_metrics(), indent=4))
+        logging.info(' Saved the metrics to file "' + json_file + '"')
+    if prometheus_file:
+        with open(prometheus_file, 'w') as f:
+            f.write(get_prometheus_metrics())
+        logging.info(' Saved the Prometheus metrics to file "' + prometheus_file + '"')
+
+
+def reset_api_metrics():
+    """
+    This function will reset the API calls metrics, the spans and the counters
+    :return:
+    """
+    with _lock:
+        _api_calls.clear()
+        _spans.clear()
+        _counters.clear()
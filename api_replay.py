@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+               https://developer.cisco.com/docs/licenses
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+__author__ = "Gabriel Zapodeanu TME, ENB"
+__email__ = "gzapodea@cisco.com"
+__version__ = "0.1.0"
+__copyright__ = "Copyright (c) 2023 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.1"
+
+import atexit
+import base64
+import functools
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import requests
+from dnacentersdk.models.mydict import MyDict
+
+import synthetic_api
+
+API_REPLAY_RECORD = 'record'  # call the APIs, and save the responses to the fixtures files
+API_REPLAY_REPLAY = 'replay'  # return the responses saved to the fixtures files, no API calls
+API_REPLAY_SYNTHETIC = 'synthetic'  # return the responses generated for a synthetic inventory, no API calls
+API_REPLAY_MODES = [API_REPLAY_RECORD, API_REPLAY_REPLAY, API_REPLAY_SYNTHETIC]
+
+CATALYST_CENTER_FIXTURE = 'catalyst_center'
+RECORD_SKIP_GROUPS = ['authentication']  # API groups not recorded, the requests and responses include credentials
+CREDENTIAL_ARGS = ['username', 'password', 'encoded_auth', 'token', 'x_auth_token']  # redacted from the call keys
+GITHUB_FIXTURE = 'github'
+
+_fixtures = {}
+_fixtures_lock = threading.Lock()
+_save_registered = False
+
+
+def get_replay_mode():
+    """
+    This function will return the API replay mode, from the API_REPLAY_MODE environment variable
+    :return: "record", "replay", "synthetic", or None to call the APIs
+    """
+    replay_mode = os.getenv('API_REPLAY_MODE', '').lower()
+    return replay_mode if replay_mode in API_REPLAY_MODES else None
+
+
+def get_fixture_file(fixture_name):
+    """
+    This function will return the fixture file name, in the API_REPLAY_DIR folder
+    :param fixture_name: fixture name, "catalyst_center" or "github"
+    :return: fixture file name
+    """
+    return os.path.join(os.getenv('API_REPLAY_DIR', 'api_fixtures'), fixture_name + '.json')
+
+
+def get_fixture(fixture_name):
+    """
+    This function will return the fixture, loaded once from the fixture file
+    :param fixture_name: fixture name
+    :return: fixture, {call key: response}
+    """
+    with _fixtures_lock:
+        fixture = _fixtures.get(fixture_name)
+        if fixture is None:
+            fixture = {}
+            if os.path.exists(get_fixture_file(fixture_name)):
+                with open(get_fixture_file(fixture_name), 'r') as f:
+                    fixture = json.load(f)
+            _fixtures[fixture_name] = fixture
+        return fixture
+
+
+def save_fixtures():
+    """
+    This function will save the recorded fixtures to files
+    :return:
+    """
+    with _fixtures_lock:
+        for fixture_name, fixture in _fixtures.items():
+            os.makedirs(os.path.dirname(get_fixture_file(fixture_name)) or '.', exist_ok=True)
+            with open(get_fixture_file(fixture_name), 'w') as f:
+                f.write(json.dumps(fixture, indent=4))
+
+
+def record_response(fixture_name, call_key, response):
+    """
+    This function will record the API call response. The fixtures are saved when the app exits
+    :param fixture_name: fixture name
+    :param call_key: call key, the endpoint and the call arguments
+    :param response: API response, JSON serializable
+    :return:
+    """
+    global _save_registered
+    fixture = get_fixture(fixture_name)
+    with _fixtures_lock:
+        fixture[call_key] = response
+        if not _save_registered:
+            atexit.register(save_fixtures)
+            _save_registered = True
+
+
+def get_recorded_response(fixture_name, call_key):
+    """
+    This function will return the recorded API call response
+    :param fixture_name: fixture name
+    :param call_key: call key, the endpoint and the call arguments
+    :return: API response
+    """
+    fixture = get_fixture(fixture_name)
+    if call_key not in fixture:
+        raise KeyError('No recorded response for "' + call_key + '" in "' + get_fixture_file(fixture_name) + '"')
+    return fixture[call_key]
+
+
+def get_call_key(endpoint, args, kwargs):
+    """
+    This function will return the call key, used to find the recorded response of an API call. The credentials
+    keyword arguments are redacted, they are not saved to the fixture files
+    :param endpoint: endpoint name, for example "devices.get_device_list"
+    :param args: call positional arguments
+    :param kwargs: call keyword arguments
+    :return: call key
+    """
+    kwargs = {key: '<redacted>' if key.lower() in CREDENTIAL_ARGS else value for key, value in kwargs.items()}
+    return endpoint + ' ' + json.dumps([list(args), kwargs], sort_keys=True, default=str)
+
+
+def get_recording_method(method, endpoint):
+    """
+    This function will return the API method wrapped to record each call response
+    :param method: SDK API method
+    :param endpoint: endpoint name, for example "devices.get_device_list"
+    :return: recording method
+    """
+    @functools.wraps(method)
+    def recording_method(*args, **kwargs):
+        response = method(*args, **kwargs)
+        record_response(CATALYST_CENTER_FIXTURE, get_call_key(endpoint, args, kwargs), response)
+        return response
+    return recording_method
+
+
+def record_api(catalyst_center_api):
+    """
+    This function will wrap all the API methods of the SDK connection object, to record each call response.
+    The authentication APIs are not recorded, the token requests include the Catalyst Center credentials
+    :param catalyst_center_api: Catalyst Center SDK connection object
+    :return:
+    """
+    for group_name, api_group in vars(catalyst_center_api).items():
+        if group_name.startswith('_') or group_name in RECORD_SKIP_GROUPS:
+            continue
+        for method_name in dir(api_group):
+            method = getattr(api_group, method_name)
+            if method_name.startswith('_') or not callable(method):
+                continue
+            setattr(api_group, method_name, get_recording_method(method, group_name + '.' + method_name))
+
+
+def get_replay_api(latency=None):
+    """
+    This function will return a stand-in for the Catalyst Center SDK connection object, with the API methods
+    recorded to the fixture file. Each API call returns the recorded response, after the configured latency
+    :param latency: latency of each API call, in seconds, default from the API_REPLAY_LATENCY environment variable
+    :return: replay API connection object
+    """
+    latency = latency if latency is not None else float(os.getenv('API_REPLAY_LATENCY', '0'))
+    groups = {}
+    for call_key in get_fixture(CATALYST_CENTER_FIXTURE):
+        group_name, method_name = call_key.split(' ', 1)[0].split('.', 1)
+        groups.setdefault(group_name, set()).add(method_name)
+
+    def get_replay_method(endpoint):
+        def replay_method(*args, **kwargs):
+            if latency:
+                time.sleep(latency)
+            return MyDict(get_recorded_response(CATALYST_CENTER_FIXTURE, get_call_key(endpoint, args, kwargs)))
+        return replay_method
+
+    api_groups = {}
+    for group_name, method_names in groups.items():
+        api_groups[group_name] = SimpleNamespace(**{method_name: get_replay_method(group_name + '.' + method_name)
+                                                    for method_name in method_names})
+    return SimpleNamespace(**api_groups)
+
+
+def get_github_call_key(method, url, params=None):
+    """
+    This function will return the call key of a GitHub API call, the method and the URL with the query parameters
+    :param method: HTTP method
+    :param url: API URL
+    :param params: optional query parameters
+    :return: call key
+    """
+    prepared_request = requests.Request(method, url, params=params).prepare()
+    return prepared_request.method + ' ' + prepared_request.url
+
+
+def record_github_response(response):
+    """
+    This function will record the GitHub API call response. The "304 Not Modified" responses are not recorded,
+    the replay returns the file content recorded with the previous "200 OK" response
+    :param response: API call response
+    :return:
+    """
+    if response.status_code == 304:
+        return
+    record_response(GITHUB_FIXTURE, get_github_call_key(response.request.method, response.request.url),
+                    {'status_code': response.status_code, 'headers': dict(response.headers),
+                     'content': response.text})
+
+
+def get_synthetic_github_response(method, url):
+    """
+    This function will return the GitHub API response for the synthetic mode: any repo exists, and the intent
+    files are the synthetic intent files
+    :param method: HTTP method
+    :param url: API URL
+    :return: recorded response format, {'status_code': ..., 'headers': ..., 'content': ...}
+    """
+    path = url.split('?', 1)[0].split('/')
+    if method == 'GET' and len(path) == 6 and path[3] == 'repos':
+        return {'status_code': 200, 'headers': {}, 'content': json.dumps({'name': path[5], 'private': True})}
+    if method == 'GET' and len(path) > 7 and path[6] == 'contents':
+        file_content = synthetic_api.get_github_file('/'.join(path[7:]))
+        if file_content is not None:
+            return {'status_code': 200, 'headers': {},
+                    'content': json.dumps({'content': base64.b64encode(file_content.encode()).decode(),
+                                           'encoding': 'base64'})}
+    return {'status_code': 404, 'headers': {}, 'content': json.dumps({'message': 'Not Found'})}
+
+
+def get_github_response(method, url, params=None):
+    """
+    This function will return the recorded, or the synthetic, GitHub API call response
+    :param method: HTTP method
+    :param url: API URL
+    :param params: optional query parameters
+    :return: response
+    """
+    call_key = get_github_call_key(method, url, params)
+    if get_replay_mode() == API_REPLAY_SYNTHETIC:
+        recorded_response = get_synthetic_github_response(method, call_key.split(' ', 1)[1])
+    else:
+        recorded_response = get_recorded_response(GITHUB_FIXTURE, call_key)
+    response = requests.Response()
+    response.status_code = recorded_response['status_code']
+    response.headers.update(recorded_response['headers'])
+    response._content = recorded_response['content'].encode()
+    response.encoding = 'utf-8'
+    response.url = call_key.split(' ', 1)[1]
+    return response
@@ -0,0 +1,364 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+               https://developer.cisco.com/docs/licenses
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+__author__ = "Gabriel Zapodeanu TME, ENB"
+__email__ = "gzapodea@cisco.com"
+__version__ = "0.1.0"
+__copyright__ = "Copyright (c) 2023 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.1"
+
+import asyncio
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import requests
+from dnacentersdk import DNACenterAPI
+from requests.adapters import HTTPAdapter
+
+import api_metrics
+import api_replay
+import synthetic_api
+
+DEVICE_LIST_LIMIT = 500  # max number of devices returned by one inventory API call
+SITE_LIST_LIMIT = 500  # max number of sites returned by one site API call
+
+CATALYST_CENTER_VERSION = '2.3.5.3'
+CATALYST_CENTER_POOL_SIZE = 16  # max number of pooled connections, and of the shared executor worker threads
+
+_catalyst_center_apis = {}
+_catalyst_center_lock = threading.Lock()
+_executor = None
+
+
+def get_instrumented_method(method, endpoint):
+    """
+    This function will return the API method wrapped to record the latency of each call
+    :param method: SDK API method
+    :param endpoint: endpoint name, used for the API calls metrics
+    :return: instrumented method
+    """
+    @functools.wraps(method)
+    def instrumented_method(*args, **kwargs):
+        start_time = time.perf_counter()
+        try:
+            response = method(*args, **kwargs)
+        except Exception:
+            api_metrics.record_api_call(endpoint, time.perf_counter() - start_time, error=True)
+            raise
+        api_metrics.record_api_call(endpoint, time.perf_counter() - start_time)
+        return response
+    return instrumented_method
+
+
+def instrument_api(catalyst_center_api):
+    """
+    This function will instrument all the API methods of the SDK connection object, for example
+    "devices.get_device_list", to record the latency of each call to the "catalyst_center.<group>.<method>" metrics
+    :param catalyst_center_api: Catalyst Center SDK connection object
+    :return:
+    """
+    for group_name, api_group in vars(catalyst_center_api).items():
+        if group_name.startswith('_'):
+            continue
+        for method_name in dir(api_group):
+            method = getattr(api_group, method_name)
+            if method_name.startswith('_') or not callable(method):
+                continue
+            setattr(api_group, method_name,
+                    get_instrumented_method(method, 'catalyst_center.' + group_name + '.' + method_name))
+
+
+def get_catalyst_center_api(base_url, username, password, verify=False):
+    """
+    This function will return the Catalyst Center SDK connection object, created once for each Catalyst Center
+    and user, and shared by all the compliance apps running in the same process. The connection object uses one
+    pooled HTTP session, the token is requested once and reused by all the API calls, and the SDK requests a new
+    token when an API call fails with "401 Unauthorized".
+    In the "replay" and "synthetic" API replay modes, a stand-in connection object is returned, see api_replay
+    :param base_url: Catalyst Center URL
+    :param username: Catalyst Center username
+    :param password: Catalyst Center password
+    :param verify: verify the Catalyst Center certificate
+    :return: Catalyst Center SDK connection object
+    """
+    with _catalyst_center_lock:
+        catalyst_center_api = _catalyst_center_apis.get((base_url, username))
+        if catalyst_center_api is not None:
+            return catalyst_center_api
+        replay_mode = api_replay.get_replay_mode()
+        if replay_mode == api_replay.API_REPLAY_REPLAY:
+            catalyst_center_api = api_replay.get_replay_api()
+        elif replay_mode == api_replay.API_REPLAY_SYNTHETIC:
+            catalyst_center_api = synthetic_api.get_synthetic_api()
+        else:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=CATALYST_CENTER_POOL_SIZE, pool_maxsize=CATALYST_CENTER_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            catalyst_center_api = DNACenterAPI(username=username, password=password, base_url=base_url,
+                                               version=CATALYST_CENTER_VERSION, verify=verify, session=session)
+            if replay_mode == api_replay.API_REPLAY_RECORD:
+                api_replay.record_api(catalyst_center_api)
+        instrument_api(catalyst_center_api)
+        if isinstance(catalyst_center_api, DNACenterAPI):
+            # request the token now, once, instead of by each of the first concurrent API calls
+            catalyst_center_api.access_token
+        _catalyst_center_apis[(base_url, username)] = catalyst_center_api
+        return catalyst_center_api
+
+
+def get_executor():
+    """
+    This function will return the executor shared by the concurrent and asynchronous API calls, created once, with
+    one worker thread for each pooled connection
+    :return: thread pool executor
+    """
+    global _executor
+    with _catalyst_center_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=CATALYST_CENTER_POOL_SIZE)
+        return _executor
+
+
+def submit_api_call(function, *args, **kwargs):
+    """
+    This function will start an API call in the background, using the shared executor, for example:
+        future = submit_api_call(catalyst_center_api.devices.get_device_count)
+    :param function: API method, or any function making API calls
+    :param args: positional arguments
+    :param kwargs: keyword arguments
+    :return: future, future.result() waits for the call to complete and returns the response
+    """
+    return get_executor().submit(function, *args, **kwargs)
+
+
+async def async_api_call(function, *args, **kwargs):
+    """
+    This function will run an API call from asyncio code, in the shared executor, for example:
+        response = await async_api_call(catalyst_center_api.sites.get_membership, site_id=site_id)
+    :param function: API method, or any function making API calls
+    :param args: positional arguments
+    :param kwargs: keyword arguments
+    :return: API response
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(function, *args, **kwargs))
+
+
+def load_device_cache(cache_file, cache_ttl):
+    """
+    This function will load the device cache saved by a previous run, dropping the entries older than the TTL
+    :param cache_file: device cache file name
+    :param cache_ttl: time to live for the cached entries, in seconds. 0 disables the on-disk cache
+    :return: device cache, {device_id: {'hostname': ..., 'role': ..., 'family': ..., ...}}
+    """
+    if not cache_ttl or not os.path.exists(cache_file):
+        return {}
+    try:
+        with open(cache_file, 'r') as f:
+            cached_devices = json.load(f)
+    except (OSError, ValueError):
+        logging.info(' Unable to read the device cache file "' + cache_file + '", ignoring it')
+        return {}
+    now = time.time()
+    device_cache = {}
+    for device_id, device_info in cached_devices.items():
+        if now - device_info.get('timestamp', 0) < cache_ttl:
+            device_cache[device_id] = device_info
+    api_metrics.increment_counter('catalyst_center.device_cache_hits', len(device_cache))
+    return device_cache
+
+
+def save_device_cache(cache_file, device_cache):
+    """
+    This function will save the device cache to file, to be reused by the next runs
+    :param cache_file: device cache file name
+    :param device_cache: device cache
+    :return:
+    """
+    with open(cache_file, 'w') as f:
+        f.write(json.dumps(device_cache, indent=4))
+
+
+def get_device_list(catalyst_center_api):
+    """
+    This function will return the inventory of all devices managed by Catalyst Center, one page at a time
+    :param catalyst_center_api: Catalyst Center SDK connection object
+    :return: device list
+    """
+    response = catalyst_center_api.devices.get_device_count()
+    device_count = response['response']
+    logging.info(' Number of devices managed by Catalyst Center: ' + str(device_count))
+
+    offset = 1
+    device_list = []
+    while offset <= device_count:
+        response = catalyst_center_api.devices.get_device_list(offset=offset, limit=DEVICE_LIST_LIMIT)
+        offset += DEVICE_LIST_LIMIT
+        device_list.extend(response['response'])
+    return device_list
+
+
+def format_device_info(device):
+    """
+    This function will return the device fields used by the compliance reports
+    :param device: device, as returned by the Catalyst Center inventory APIs
+    :return: device info, {'hostname': ..., 'role': ..., 'family': ..., 'device_family': ..., 'device_ip': ...}
+    """
+    return {'hostname': device['hostname'], 'role': device['role'], 'family': device['family'],
+            'device_family': device['type'], 'device_ip': device['managementIpAddress'], 'timestamp': time.time()}
+
+
+def get_device_index(device_list):
+    """
+    This function will index the device inventory by device id
+    :param device_list: device list
+    :return: device index, {device_id: device info}
+    """
+    device_index = {}
+    for device in device_list:
+        device_index[device['id']] = format_device_info(device)
+    return device_index
+
+
+def get_device_info(catalyst_center_api, device_id, device_index):
+    """
+    This function will return the device info from the device index. Devices missing from the index, for example
+    added after the inventory was collected, are collected from Catalyst Center once and added to the index
+    :param catalyst_center_api: Catalyst Center SDK connection object
+    :param device_id: device UUID
+    :param device_index: device index, updated with the devices collected from Catalyst Center
+    :return: device info
+    """
+    device_info = device_index.get(device_id)
+    if device_info is None:
+        api_metrics.increment_counter('catalyst_center.device_index_misses')
+        response = catalyst_center_api.devices.get_device_by_id(id=device_id)
+        device_info = format_device_info(response['response'])
+        device_index[device_id] = device_info
+    return device_info
+
+
+def run_concurrently(function, items, max_workers):
+    """
+    This function will call the function for each item, using the shared executor to run the Catalyst Center API
+    calls concurrently, see run_concurrently_as_completed
+    :param function: function to call, with one item as argument
+    :param items: list of items
+    :param max_workers: max number of concurrent calls
+    :return: list of results, in the same order as the items
+    """
+    items = list(items)
+    results = [None] * len(items)
+    indexed_results = run_concurrently_as_completed(lambda index: function(items[index]), range(len(items)),
+                                                    max_workers)
+    for index, result, error in indexed_results:
+        if error is not None:
+            raise error
+        results[index] = result
+    return results
+
+
+def run_concurrently_as_completed(function, items, max_workers):
+    """
+    This function will call the function for each item using the shared executor, and it will yield each result
+    as soon as it is available. At most max_workers calls run at the same time, and at most 2 * max_workers calls
+    are submitted and not yet consumed, the next items are submitted as the results are consumed, to limit the
+    results held in memory. If the consumer stops, the calls not yet started are cancelled.
+    The function must not call run_concurrently itself, the nested calls could wait for the shared executor
+    worker threads used by the outer calls
+    :param function: function to call, with one item as argument
+    :param items: list of items
+    :param max_workers: max number of concurrent calls, the shared executor runs up to CATALYST_CENTER_POOL_SIZE
+                        calls for all the callers
+    :return: generator of (item, result, error), error is None if the call was successful
+    """
+    max_workers = max(1, max_workers)
+    executor = get_executor()
+    items = iter(items)
+    futures = {}
+    no_items = object()
+
+    def submit_items():
+        running = sum(1 for future in futures if not future.done())
+        while running < max_workers and len(futures) < 2 * max_workers:
+            item = next(items, no_items)
+            if item is no_items:
+                return
+            futures[executor.submit(function, item)] = item
+            running += 1
+
+    try:
+        submit_items()
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            future = done.pop()
+            item = futures.pop(future)
+            submit_items()
+            error = future.exception()
+            result = future.result() if error is None else None
+            yield item, result, error
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def get_site_list(catalyst_center_api):
+    """
+    This function will return all sites, one page at a time
+    :param catalyst_center_api: Catalyst Center SDK connection object
+    :return: site list
+    """
+    offset = 1
+    site_list = []
+    while True:
+        response = catalyst_center_api.sites.get_site(offset=offset, limit=SITE_LIST_LIMIT)
+        sites = response['response']
+        site_list.extend(sites)
+        if len(sites) < SITE_LIST_LIMIT:
+            return site_list
+        offset += SITE_LIST_LIMIT
+
+
+def get_device_site_index(catalyst_center_api, site_list, max_workers):
+    """
+    This function will return the site hierarchy for each device assigned to a site, using one site membership
+    API call for each site. The devices are mapped to the most specific site
+    :param catalyst_center_api: Catalyst Center SDK connection object
+    :param site_list: site list, see get_site_list
+    :param max_workers: max number of concurrent calls
+    :return: {device_id: site name hierarchy}
+    """
+    site_names = {site['id']: site['siteNameHierarchy'] for site in site_list}
+
+    def get_site_members(site):
+        response = catalyst_center_api.sites.get_membership(site_id=site['id'])
+        return response.get('device') or []
+
+    device_sites = {}
+    for site, site_members in zip(site_list, run_concurrently(get_site_members, site_list, max_workers)):
+        for members in site_members:
+            site_name = site_names.get(members.get('siteId'), site['siteNameHierarchy'])
+            for device in members.get('response') or []:
+                device_id = device.get('instanceUuid') or device.get('id')
+                if len(site_name) > len(device_sites.get(device_id, '')):
+                    device_sites[device_id] = site_name
+    return device_sites
@@ -20,113 +20,343 @@ __version__ = "0.1.0"
 __copyright__ = "Copyright (c) 2023 Cisco and/or its affiliates."
 __license__ = "Cisco Sample Code License, Version 1.1"
 
+import argparse
+import fnmatch
 import json
 import logging
 import os
 import time
 from datetime import datetime
 
-from dnacentersdk import DNACenterAPI
+import yaml
 from dotenv import load_dotenv
 from requests.auth import HTTPBasicAuth  # for Basic Auth
 
+import api_metrics
+import catalyst_center_apis
+
 load_dotenv('environment.env')
 
 CATALYST_CENTER_URL = os.getenv('CATALYST_CENTER_URL')
 CATALYST_CENTER_USER = os.getenv('CATALYST_CENTER_USER')
 CATALYST_CENTER_PASS = os.getenv('CATALYST_CENTER_PASS')
 
+DEVICE_CACHE_FILE = 'device_cache.json'
+COMPLIANCE_SNAPSHOT_FILE = 'compliance_snapshot.json'
+COMPLIANCE_DELTA_FILE = 'compliance_delta.json'
+COMPLIANCE_REPORTS_FILE = os.getenv('COMPLIANCE_REPORTS_FILE', 'compliance_reports.yaml')
+
+DEFAULT_REPORT_SPECS = [
+    {'name': 'all devices', 'file': 'compliance_report.json'},
+    {'name': 'core devices', 'file': 'compliance_report_core.json', 'filter': {'role': ['CORE']}},
+    {'name': 'device roles', 'file': 'compliance_report_roles.json', 'group_by': 'role'}
+]
+DEVICE_CACHE_TTL = int(os.getenv('DEVICE_CACHE_TTL', '0'))  # seconds, 0 disables the on-disk device cache
+CATALYST_CENTER_MAX_WORKERS = int(os.getenv('CATALYST_CENTER_MAX_WORKERS', '8'))  # max concurrent API calls
+
 os.environ['TZ'] = 'America/Los_Angeles'  # define the timezone for PST
 time.tzset()  # adjust the timezone, more info https://help.pythonanywhere.com/pages/SettingTheTimezone/
 
 CATALYST_CENTER_AUTH = HTTPBasicAuth(CATALYST_CENTER_USER, CATALYST_CENTER_PASS)
 
 
-def main():
+def load_compliance_snapshot(snapshot_file):
     """
-    This app will create a Catalyst Center non-compliant devices report, based on out-of-the-box compliance features.
-    It will call the compliance and device details APIs to identify all devices non-compliant
-    for various compliance validations. It will create a report for non-compliant devices with role "CORE".
-    The app may be part of a CI/CD pipeline to run on-demand or scheduled.
-    This app is using the Python SDK to make REST API calls to Cisco DNA Center.
+    This function will load the non-compliant devices snapshot saved by the previous delta run
+    :param snapshot_file: snapshot file name
+    :return: snapshot, {device_id: {'hostname': ..., 'non_compliant': [compliance types]}}
     """
+    if not os.path.exists(snapshot_file):
+        return {}
+    with open(snapshot_file, 'r') as f:
+        return json.load(f)
 
-    # logging, debug level, to file {application_run.log}
-    logging.basicConfig(level=logging.INFO)
 
-    current_time = str(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
-    logging.info(' Application "catalyst_center_compliance.py" Start, ' + current_time)
+def group_compliance(network_compliance):
+    """
+    This function will group the compliance details by compliance type, status and device, in one pass
+    :param network_compliance: compliance details, as returned by the compliance API
+    :return: {'status_count': {compliance type: {status: count}},
+              'non_compliant': {compliance type: [device ids]},
+              'devices': {device id: [non-compliant compliance types]}}
+    """
+    compliance_groups = {'status_count': {}, 'non_compliant': {}, 'devices': {}}
+    for item in network_compliance:
+        compliance_type = item['complianceType']
+        status = item['status']
+        status_count = compliance_groups['status_count'].setdefault(compliance_type, {})
+        status_count[status] = status_count.get(status, 0) + 1
+        non_compliant_devices = compliance_groups['non_compliant'].setdefault(compliance_type, [])
+        if status == 'NON_COMPLIANT':
+            non_compliant_devices.append(item['deviceUuid'])
+            compliance_groups['devices'].setdefault(item['deviceUuid'], []).append(compliance_type)
+    return compliance_groups
 
-    # verify if folder for state files exist
 
-    # create a DNACenterAPI "Connection Object" to use the Python SDK
-    catalyst_center_api = DNACenterAPI(username=CATALYST_CENTER_USER, password=CATALYST_CENTER_PASS,
-                                       base_url=CATALYST_CENTER_URL, version='2.3.5.3',
-                                       verify=False)
+def load_report_specs(report_specs_file):
+    """
+    This function will load the reports specification from the YAML file. If the file does not exist,
+    the default reports are created: all devices, "CORE" devices and each device role
+    :param report_specs_file: reports specification file name
+    :return: list of report specs, {'name': ..., 'file': ..., 'filter': {field: [patterns]}, 'group_by': field}
+    """
+    if not os.path.exists(report_specs_file):
+        return DEFAULT_REPORT_SPECS
+    with open(report_specs_file, 'r') as f:
+        report_specs = yaml.safe_load(f)['reports']
+    for report_spec in report_specs:
+        for field, patterns in (report_spec.get('filter') or {}).items():
+            if isinstance(patterns, str):
+                report_spec['filter'][field] = [patterns]
+    return report_specs
+
+
+def report_specs_use_field(report_specs, field):
+    """
+    This function will verify if any of the reports is filtered or grouped by the device field
+    :param report_specs: list of report specs
+    :param field: device info field
+    :return: True or False
+    """
+    for report_spec in report_specs:
+        if report_spec.get('group_by') == field or field in (report_spec.get('filter') or {}):
+            return True
+    return False
+
+
+def match_report_filter(report_filter, info):
+    """
+    This function will verify if the device matches the report filter, each filter field value is a list of
+    shell-style patterns, for example "Global/OR/*"
+    :param report_filter: {field: [patterns]}
+    :param info: device info
+    :return: True or False
+    """
+    for field, patterns in report_filter.items():
+        value = str(info.get(field))
+        if not any(fnmatch.fnmatchcase(value, pattern) for pattern in patterns):
+            return False
+    return True
+
+
+def get_compliance_reports(compliance_groups, device_info, report_specs):
+    """
+    This function will create all the non-compliant devices reports in one pass over the compliance groups.
+    Each report is filtered and optionally grouped by a device field, as defined by the report spec
+    :param compliance_groups: compliance details grouped by type, see group_compliance
+    :param device_info: {device id: device info}, for the non-compliant devices
+    :param report_specs: list of report specs, see load_report_specs
+    :return: {report name: report}, the report is {compliance type: [hostnames]}, or
+             {field value: {compliance type: [hostnames]}} for the reports grouped by a device field
+    """
+    compliance_types = list(compliance_groups['non_compliant'])
+
+    # the devices matching each report filter, evaluated once for each device
+    report_devices = {}
+    for report_spec in report_specs:
+        report_filter = report_spec.get('filter') or {}
+        report_devices[report_spec['name']] = {device_id for device_id, info in device_info.items()
+                                               if match_report_filter(report_filter, info)}
+
+    reports = {}
+    for report_spec in report_specs:
+        if report_spec.get('group_by'):
+            reports[report_spec['name']] = {}
+        else:
+            reports[report_spec['name']] = {item: [] for item in compliance_types}
+
+    for compliance_type, device_ids in compliance_groups['non_compliant'].items():
+        for device_id in device_ids:
+            info = device_info[device_id]
+            for report_spec in report_specs:
+                if device_id not in report_devices[report_spec['name']]:
+                    continue
+                report = reports[report_spec['name']]
+                if report_spec.get('group_by'):
+                    group = str(info.get(report_spec['group_by']))
+                    if group not in report:
+                        report[group] = {item: [] for item in compliance_types}
+                    report = report[group]
+                report[compliance_type].append(info['hostname'])
+    return reports
 
+
+def get_compliance_snapshot(compliance_groups, device_info):
+    """
+    This function will create the non-compliant devices snapshot
+    :param compliance_groups: compliance details grouped by type, see group_compliance
+    :param device_info: {device_id: device info}, for the non-compliant devices
+    :return: snapshot, {device_id: {'hostname': ..., 'non_compliant': [compliance types]}}
+    """
+    snapshot = {}
+    for device_id, compliance_types in compliance_groups['devices'].items():
+        snapshot[device_id] = {'hostname': device_info[device_id]['hostname'],
+                               'non_compliant': sorted(set(compliance_types))}
+    return snapshot
+
+
+def get_compliance_delta(previous_snapshot, current_snapshot):
+    """
+    This function will compare two non-compliant devices snapshots, using the device ids and compliance types sets
+    :param previous_snapshot: snapshot saved by the previous delta run
+    :param current_snapshot: snapshot for this run
+    :return: delta, {'new_non_compliant': {hostname: [types]}, 'new_compliant': {hostname: [types]},
+                     'compliance_type_changes': {hostname: {'added': [types], 'removed': [types]}}}
+    """
+    previous_devices = set(previous_snapshot)
+    current_devices = set(current_snapshot)
+
+    delta = {'new_non_compliant': {}, 'new_compliant': {}, 'compliance_type_changes': {}}
+    for device_id in current_devices - previous_devices:
+        device_snapshot = current_snapshot[device_id]
+        delta['new_non_compliant'][device_snapshot['hostname']] = device_snapshot['non_compliant']
+    for device_id in previous_devices - current_devices:
+        device_snapshot = previous_snapshot[device_id]
+        delta['new_compliant'][device_snapshot['hostname']] = device_snapshot['non_compliant']
+    for device_id in current_devices & previous_devices:
+        previous_types = set(previous_snapshot[device_id]['non_compliant'])
+        current_types = set(current_snapshot[device_id]['non_compliant'])
+        if previous_types != current_types:
+            delta['compliance_type_changes'][current_snapshot[device_id]['hostname']] = {
+                'added': sorted(current_types - previous_types), 'removed': sorted(previous_types - current_types)}
+    return delta
+
+
+def run_compliance_reports(catalyst_center_api, device_list=None, site_list=None, delta_mode=False):
+    """
+    This function will create the non-compliant devices reports, or the report of changes since the previous delta run.
+    The device inventory and the site list may be collected once by the caller, and shared with other compliance
+    checks
+    :param catalyst_center_api: Catalyst Center SDK connection object
+    :param device_list: optional device list, see catalyst_center_apis.get_device_list
+    :param site_list: optional site list, see catalyst_center_apis.get_site_list
+    :param delta_mode: True to create only the report of changes since the previous delta run
+    :return: {report name: report}, or the changes report in delta mode
+    """
     get_compliance_response = catalyst_center_api.compliance.get_compliance_detail()
     network_compliance_info = get_compliance_response['response']
     logging.info(' Collected Catalyst Center network compliance state')
 
-    # sort the list of compliance status, by device Id
-    network_compliance = sorted(network_compliance_info, key=lambda x: x['deviceUuid'])
-
-    # identify all compliance checks in environment
-    compliance_type = []
-    for item in network_compliance:
-        item_compliance = item['complianceType']
-        if item_compliance not in compliance_type:
-            compliance_type.append(item_compliance)
+    # group the compliance details by compliance type, status and device, in one pass
+    with api_metrics.span('catalyst_center_compliance.group_compliance'):
+        compliance_groups = group_compliance(network_compliance_info)
+    compliance_type = list(compliance_groups['non_compliant'])
 
     logging.info(' Type of compliance checks: ' + json.dumps(compliance_type, indent=4))
+    logging.info(' Compliance status count for each type: ' + json.dumps(compliance_groups['status_count'], indent=4))
 
-    # create report for non-compliant devices for each compliance type
-    compliance_report = {}
-    for item in compliance_type:
-        compliance_report.update({item: []})
+    # collect the device inventory once, or reuse the inventory collected by the runner or saved by a recent run
+    if device_list is not None:
+        device_index = catalyst_center_apis.get_device_index(device_list)
+    else:
+        device_index = catalyst_center_apis.load_device_cache(DEVICE_CACHE_FILE, DEVICE_CACHE_TTL)
+    if not device_index:
+        device_list = catalyst_center_apis.get_device_list(catalyst_center_api)
+        device_index = catalyst_center_apis.get_device_index(device_list)
+        logging.info(' Collected the device list from Catalyst Center')
 
-    # loop through each item in compliance and append to report, to the specific category
-    for item in network_compliance:
-        if item['status'] == 'NON_COMPLIANT':
-            item_compliance = item['complianceType']
-            device_id = item['deviceUuid']
-            device_info = catalyst_center_api.devices.get_device_by_id(id=device_id)
-            device_hostname = device_info['response']['hostname']
-            compliance_report[item_compliance].append(device_hostname)
+    # join the non-compliant devices with the device inventory
+    device_info = {}
+    with api_metrics.span('catalyst_center_compliance.join_device_inventory'):
+        for device_id in compliance_groups['devices']:
+            device_info[device_id] = catalyst_center_apis.get_device_info(catalyst_center_api, device_id,
+                                                                          device_index)
+    api_metrics.increment_counter('catalyst_center_compliance.devices_processed', len(device_info))
+    if DEVICE_CACHE_TTL:
+        catalyst_center_apis.save_device_cache(DEVICE_CACHE_FILE, device_index)
+    logging.info(' Resolved the non-compliant devices hostname and role, number of devices: ' + str(len(device_info)))
 
-    logging.info(' Non-compliant devices report completed: ')
+    # in delta mode, compare with the snapshot saved by the previous delta run, and save the new snapshot.
+    # The full runs do not update the snapshot, the next delta run reports all the changes since the last delta run
+    if delta_mode:
+        compliance_snapshot = get_compliance_snapshot(compliance_groups, device_info)
+        previous_snapshot = load_compliance_snapshot(COMPLIANCE_SNAPSHOT_FILE)
+        compliance_delta = get_compliance_delta(previous_snapshot, compliance_snapshot)
+        logging.info(' Non-compliant devices changes report completed: ')
+        logging.info(' ' + json.dumps(compliance_delta, indent=4))
+        with open(COMPLIANCE_DELTA_FILE, 'w') as f:
+            f.write(json.dumps(compliance_delta, indent=4))
+        logging.info(' Saved the non-compliant devices changes report to file "' + COMPLIANCE_DELTA_FILE + '"')
+        with open(COMPLIANCE_SNAPSHOT_FILE, 'w') as f:
+            f.write(json.dumps(compliance_snapshot, indent=4))
+        return compliance_delta
 
-    logging.info(' ' + json.dumps(compliance_report, indent=4))
+    # collect the devices site, only if required by the reports
+    report_specs = load_report_specs(COMPLIANCE_REPORTS_FILE)
+    if report_specs_use_field(report_specs, 'site'):
+        if site_list is None:
+            site_list = catalyst_center_apis.get_site_list(catalyst_center_api)
+        with api_metrics.span('catalyst_center_compliance.device_sites'):
+            device_sites = catalyst_center_apis.get_device_site_index(catalyst_center_api, site_list,
+                                                                      CATALYST_CENTER_MAX_WORKERS)
+        for device_id, info in device_info.items():
+            info['site'] = device_sites.get(device_id)
+        logging.info(' Collected the devices site, number of sites: ' + str(len(site_list)))
 
-    # save report to JSON formatted file
-    with open('compliance_report.json', 'w') as f:
-        f.write(json.dumps(compliance_report, indent=4))
-    logging.info(' Saved the non-compliant devices report to file "compliance_report.json"')
+    # create all the non-compliant devices reports, from the same compliance groups
+    with api_metrics.span('catalyst_center_compliance.compliance_reports'):
+        compliance_reports = get_compliance_reports(compliance_groups, device_info, report_specs)
+    for report_spec in report_specs:
+        compliance_report = compliance_reports[report_spec['name']]
+        logging.info(' Non-compliant devices report "' + report_spec['name'] + '" completed: ')
+        logging.info(' ' + json.dumps(compliance_report, indent=4))
 
-    # create report for non-compliant core devices for each compliance type
-    compliance_report_core = {}
-    for item in compliance_type:
-        compliance_report_core.update({item: []})
+        # save report to JSON formatted file
+        with open(report_spec['file'], 'w') as f:
+            f.write(json.dumps(compliance_report, indent=4))
+        logging.info(' Saved the non-compliant devices report "' + report_spec['name'] + '" to file "' +
+                     report_spec['file'] + '"')
+
+    return compliance_reports
 
-    # loop through each item in compliance and append to report, to the specific category
-    for item in network_compliance:
-        if item['status'] == 'NON_COMPLIANT':
-            item_compliance = item['complianceType']
-            device_id = item['deviceUuid']
-            device_info = catalyst_center_api.devices.get_device_by_id(id=device_id)
-            device_hostname = device_info['response']['hostname']
-            device_role = device_info['response']['role']
-            if device_role == 'CORE':
-                compliance_report_core[item_compliance].append(device_hostname)
 
-    logging.info(' Non-compliant Core devices report completed: ')
+def main(delta_mode=False):
+    """
+    This app will create a Catalyst Center non-compliant devices report, based on out-of-the-box compliance features.
+    It will call the compliance and device details APIs to identify all devices non-compliant
+    for various compliance validations. It will create a report for all non-compliant devices, a report for
+    non-compliant devices with role "CORE", and a report for each device role.
+    The reports may be customized with a local YAML file, each report may filter the devices by role, site,
+    family or hostname, and it may be grouped by one of these fields. Example:
+        ---
+        reports:
+          - name: all devices
+            file: compliance_report.json
+          - name: access and distribution
+            file: compliance_report_access.json
+            filter:
+              role: [ACCESS, DISTRIBUTION]
+          - name: Oregon sites
+            file: compliance_report_sites.json
+            filter:
+              site: Global/OR/*
+            group_by: site
+        ...
+    All reports are created from the same compliance details and device inventory, the devices site is collected
+    only if required by the reports.
+    In delta mode, it will create only the report of changes since the previous delta run: new non-compliant devices,
+    devices that became compliant, and compliance types changes.
+    The app may be part of a CI/CD pipeline to run on-demand or scheduled.
+    This app is using the Python SDK to make REST API calls to Cisco DNA Center.
+    :param delta_mode: True to create only the report of changes since the previous delta run
+    """
+
+    # logging, debug level, to file {application_run.log}
+    logging.basicConfig(level=logging.INFO)
+
+    current_time = str(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    logging.info(' Application "catalyst_center_compliance.py" Start, ' + current_time)
+
+    # verify if folder for state files exist
+
+    # create a DNACenterAPI "Connection Object" to use the Python SDK
+    catalyst_center_api = catalyst_center_apis.get_catalyst_center_api(CATALYST_CENTER_URL, CATALYST_CENTER_USER,
+                                                                        CATALYST_CENTER_PASS)
 
-    logging.info(' ' + json.dumps(compliance_report_core, indent=4))
+    run_compliance_reports(catalyst_center_api, delta_mode=delta_mode)
 
-    # save report to JSON formatted file
-    with open('compliance_report_core.json', 'w') as f:
-        f.write(json.dumps(compliance_report, indent=4))
-    logging.info(' Saved the Core non-compliant devices report to file "compliance_report.json"')
+    api_metrics.log_api_metrics()
+    api_metrics.export_metrics()
 
     date_time = str(datetime.now().replace(microsecond=0))
     logging.info(' End of Application "catalyst_center_compliance.py" Run: ' + date_time)
@@ -135,4 +365,8 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='Catalyst Center non-compliant devices report')
+    parser.add_argument('--delta', action='store_true',
+                        help='create only the report of the compliance changes since the previous delta run')
+    args = parser.parse_args()
+    main(delta_mode=args.delta)
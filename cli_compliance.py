@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+               https://developer.cisco.com/docs/licenses
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+__author__ = "Gabriel Zapodeanu TME, ENB"
+__email__ = "gzapodea@cisco.com"
+__version__ = "0.1.0"
+__copyright__ = "Copyright (c) 2023 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.1"
+
+import difflib
+import fnmatch
+import time
+
+MATCH_MODE_INDEX = 'index'
+MATCH_MODE_DIFFLIB = 'difflib'
+MATCH_MODES = [MATCH_MODE_INDEX, MATCH_MODE_DIFFLIB]
+
+
+def is_ntp_charjunk(character):
+    """
+    This function will identify the junk characters ignored by the difflib comparison of the NTP commands
+    :param character: character
+    :return: True or False
+    """
+    return character in [',', '.', '-', "'"]
+
+
+# difflib junk characters filter for each rule group, the "difflib" match mode keeps the previous NTP comparison
+DIFFLIB_CHARJUNK = {'ntp_config': is_ntp_charjunk}
+
+
+def get_config_lines(config):
+    """
+    This function will split the config in lines, each line ending with a new line
+    :param config: config text
+    :return: list of config lines
+    """
+    return [line + '\n' for line in config.splitlines()]
+
+
+def normalize_config_line(line):
+    """
+    This function will normalize a config line: remove the indentation and the trailing spaces, and
+    replace multiple spaces between words with one space
+    :param line: config line
+    :return: normalized line
+    """
+    return ' '.join(line.split())
+
+
+def parse_config(config):
+    """
+    This function will parse the config in one pass, and it will create a tree of config sections based on the
+    lines indentation. Each line is identified by its path, the tuple of the parent sections lines and the line:
+        ('interface Loopback0', 'ip address 10.1.1.1 255.255.255.255')
+    :param config: config text
+    :return: config tree, {'paths': set of all paths, 'ordered_paths': paths in config order,
+                           'children': {parent path: list of child paths}, 'sections': cache for the sections lookup}
+    """
+    config_tree = {'paths': set(), 'ordered_paths': [], 'children': {(): []}, 'sections': {}}
+    parents = []  # stack of (indentation, path) for the open sections
+    for line in config.splitlines():
+        command = normalize_config_line(line)
+        if not command or command.startswith('!'):
+            continue
+        indentation = len(line) - len(line.lstrip())
+        while parents and parents[-1][0] >= indentation:
+            parents.pop()
+        parent_path = parents[-1][1] if parents else ()
+        path = parent_path + (command,)
+        if path not in config_tree['paths']:
+            config_tree['paths'].add(path)
+            config_tree['ordered_paths'].append(path)
+            config_tree['children'].setdefault(parent_path, []).append(path)
+        parents.append((indentation, path))
+    return config_tree
+
+
+def get_config_sections(config_tree, section):
+    """
+    This function will return the config sections matching the section path. Each section path item may be a
+    command, or a shell-style pattern, for example "interface GigabitEthernet1/0/*".
+    The result is cached in the config tree, each section path is resolved only once for each device
+    :param config_tree: config tree, see parse_config
+    :param section: section path, list of section commands or patterns, or a string for top level sections
+    :return: list of the matching section paths
+    """
+    if isinstance(section, str):
+        section = [section]
+    section_key = tuple(normalize_config_line(pattern) for pattern in section)
+    section_paths = config_tree['sections'].get(section_key)
+    if section_paths is None:
+        section_paths = [()]
+        for pattern in section_key:
+            section_paths = [child for path in section_paths for child in config_tree['children'].get(path, [])
+                             if fnmatch.fnmatchcase(child[-1], pattern)]
+        config_tree['sections'][section_key] = section_paths
+    return section_paths
+
+
+def get_intent_paths(commands):
+    """
+    This function will parse the intent commands, indented commands are children of the previous command
+    :param commands: intent commands text
+    :return: list of the intent commands paths
+    """
+    return parse_config(commands)['ordered_paths']
+
+
+def get_missing_commands(intent_paths, config_tree, section=None):
+    """
+    This function will return the intent commands not found in the device config tree, each intent command is
+    checked in O(1). The commands order in the running config is not relevant
+    :param intent_paths: intent commands paths, see get_intent_paths
+    :param config_tree: device config tree, see parse_config
+    :param section: optional section path, the intent commands are validated under each matching section
+    :return: list of missing commands, the sections commands are separated by " > "
+    """
+    if not section:
+        return [' > '.join(path) for path in intent_paths if path not in config_tree['paths']]
+
+    section_paths = get_config_sections(config_tree, section)
+    if not section_paths:
+        section = [section] if isinstance(section, str) else section
+        return [' > '.join(list(section) + list(path)) for path in intent_paths]
+    missing_commands = []
+    for section_path in section_paths:
+        for path in intent_paths:
+            if section_path + path not in config_tree['paths']:
+                missing_commands.append(' > '.join(section_path + path))
+    return missing_commands
+
+
+def get_missing_commands_difflib(intent_lines, config_lines, charjunk=None):
+    """
+    This function will return the intent commands not found in the device config, using difflib
+    :param intent_lines: intent commands lines
+    :param config_lines: device config lines
+    :param charjunk: optional function to filter junk characters, see difflib.Differ
+    :return: list of missing commands
+    """
+    difference = difflib.Differ(charjunk=charjunk)
+    missing_commands = []
+    for line in difference.compare(intent_lines, config_lines):
+        if line.startswith('-'):
+            missing_commands.append(line[1:].strip())
+    return missing_commands
+
+
+def get_rule_group_label(name):
+    """
+    This function will return the rule group label used in the logs, for example "aaa_config" -> "AAA config"
+    :param name: rule group name
+    :return: rule group label
+    """
+    if name.endswith('_config'):
+        return name[:-len('_config')].replace('_', ' ').upper() + ' config'
+    return name
+
+
+def get_rule_groups(intent_config):
+    """
+    This function will discover and compile the rule groups from the intent config. Each top level key with
+    "commands" is a rule group, with an optional "section" path. The commands are compiled once, for all devices
+    :param intent_config: intent config, parsed from the intent YAML file
+    :return: list of rule groups, in the intent file order
+    """
+    rule_groups = []
+    for name, rule in intent_config.items():
+        if not isinstance(rule, dict) or 'commands' not in rule:
+            continue
+        commands = rule['commands']
+        rule_groups.append({'name': name, 'label': get_rule_group_label(name), 'commands': commands,
+                            'section': rule.get('section'), 'charjunk': DIFFLIB_CHARJUNK.get(name),
+                            'intent_lines': get_config_lines(commands),
+                            'intent_paths': get_intent_paths(commands)})
+    return rule_groups
+
+
+def check_rule_groups(rule_groups, device_config, match_mode=MATCH_MODE_INDEX):
+    """
+    This function will validate all the rule groups against the device config. The device config is parsed
+    once, and each rule group is checked against the same config tree
+    :param rule_groups: rule groups, see get_rule_groups
+    :param device_config: device running config
+    :param match_mode: "index" or "difflib"
+    :return: {rule group name: {'status': 'passed'|'failed', 'missing_commands': [...], 'check_time': seconds}}
+    """
+    if match_mode == MATCH_MODE_DIFFLIB:
+        config_lines = get_config_lines(device_config)
+    else:
+        config_tree = parse_config(device_config)
+
+    results = {}
+    for rule_group in rule_groups:
+        start_time = time.perf_counter()
+        if match_mode == MATCH_MODE_DIFFLIB:
+            missing_commands = get_missing_commands_difflib(rule_group['intent_lines'], config_lines,
+                                                            charjunk=rule_group.get('charjunk'))
+        else:
+            missing_commands = get_missing_commands(rule_group['intent_paths'], config_tree, rule_group['section'])
+        results[rule_group['name']] = {'status': 'failed' if missing_commands else 'passed',
+                                       'missing_commands': missing_commands,
+                                       'check_time': round(time.perf_counter() - start_time, 6)}
+    return results
@@ -0,0 +1,342 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+               https://developer.cisco.com/docs/licenses
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+__author__ = "Gabriel Zapodeanu TME, ENB"
+__email__ = "gzapodea@cisco.com"
+__version__ = "0.1.0"
+__copyright__ = "Copyright (c) 2023 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.1"
+
+import argparse
+import functools
+import json
+import logging
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import yaml
+
+import api_metrics
+import catalyst_center_apis
+import catalyst_center_compliance
+import cli_compliance
+import device_config_compliance
+import network_settings_compliance
+import synthetic_api
+
+BENCHMARK_RESULTS_FILE = 'benchmark_results.json'
+BENCHMARK_REPEAT = 5  # number of timed runs of each stage, the median wall time is reported
+REGRESSION_THRESHOLD = 0.2  # wall time or peak memory increase reported as a regression, 20%
+REGRESSION_MIN_TIME = 0.05  # seconds, smaller wall time increases are not reported as regressions
+REGRESSION_MIN_MEMORY = 1048576  # bytes, smaller peak memory increases are not reported as regressions
+
+
+def get_benchmark_api(devices, latency, config_lines):
+    """
+    This function will return the synthetic Catalyst Center API, instrumented to count the API calls of each stage
+    :param devices: number of devices
+    :param latency: latency of each API call, in seconds
+    :param config_lines: number of running config lines for each device
+    :return: synthetic API connection object
+    """
+    catalyst_center_api = synthetic_api.get_synthetic_api(devices=devices, latency=latency, config_lines=config_lines)
+    catalyst_center_apis.instrument_api(catalyst_center_api)
+    return catalyst_center_api
+
+
+def get_rule_groups(rule_groups, intent_commands):
+    """
+    This function will generate the rule groups, each with the same number of intent commands
+    :param rule_groups: number of rule groups
+    :param intent_commands: number of intent commands for each rule group
+    :return: rule groups, see cli_compliance.get_rule_groups
+    """
+    intent_config = {}
+    for rule_group in range(rule_groups):
+        intent_config['rule_group_' + str(rule_group)] = {
+            'commands': synthetic_api.generate_intent(intent_commands, seed=rule_group)}
+    return cli_compliance.get_rule_groups(intent_config)
+
+
+def benchmark_grouping(devices):
+    """
+    This function will return the non-compliant devices reports stage: the compliance details grouping, the device
+    inventory join and all the default reports, as in catalyst_center_compliance.run_compliance_reports.
+    The compliance details are generated before the stage runs, the stage does not time the synthetic data generation
+    :param devices: number of devices
+    :return: stage function, returns the number of compliance details processed
+    """
+    device_index = catalyst_center_apis.get_device_index([synthetic_api.get_device(index) for index in range(devices)])
+    report_specs = catalyst_center_compliance.DEFAULT_REPORT_SPECS
+    network_compliance = synthetic_api.generate_compliance_detail(devices)
+
+    def run(api):
+        compliance_groups = catalyst_center_compliance.group_compliance(network_compliance)
+        device_info = {device_id: catalyst_center_apis.get_device_info(api, device_id, device_index)
+                       for device_id in compliance_groups['devices']}
+        catalyst_center_compliance.get_compliance_snapshot(compliance_groups, device_info)
+        catalyst_center_compliance.get_compliance_reports(compliance_groups, device_info, report_specs)
+        return len(network_compliance)
+    return run
+
+
+def benchmark_enrichment(devices, max_workers):
+    """
+    This function will return the device inventory enrichment stage: the location and fabric roles API calls for each
+    network device, as in device_config_compliance.run_device_config_compliance
+    :param devices: number of devices
+    :param max_workers: max number of concurrent API calls
+    :return: stage function, returns the number of devices processed
+    """
+    device_list = [synthetic_api.get_device(index) for index in range(devices)]
+    network_devices = [device for device in device_list if device.family != 'Unified AP']
+
+    def run(api):
+        device_inventory = catalyst_center_apis.run_concurrently(
+            functools.partial(device_config_compliance.get_device_details, api), network_devices, max_workers)
+        return len(device_inventory)
+    return run
+
+
+def benchmark_config_compare(devices, config_lines, rule_groups, intent_commands, match_mode):
+    """
+    This function will return the device config compare stage: all the rule groups checked against each device
+    running config, as in device_config_compliance.run_device_config_compliance. The configs are generated before
+    the stage runs
+    :param devices: number of devices
+    :param config_lines: number of running config lines for each device
+    :param rule_groups: number of rule groups
+    :param intent_commands: number of intent commands for each rule group
+    :param match_mode: "index" or "difflib"
+    :return: stage function, returns the number of devices processed
+    """
+    device_rule_groups = get_rule_groups(rule_groups, intent_commands)
+    configs = [synthetic_api.generate_config(config_lines, seed=device) for device in range(devices)]
+
+    def run(api):
+        for config in configs:
+            cli_compliance.check_rule_groups(device_rule_groups, config, match_mode)
+        return len(configs)
+    return run
+
+
+def benchmark_settings_eval(devices, max_workers):
+    """
+    This function will return the network settings stage: the site hierarchy scan, one network settings API call
+    for each building, and the settings rules for each building, as in
+    network_settings_compliance.run_network_settings_compliance
+    :param devices: number of devices, the synthetic site hierarchy has one building for each 100 devices
+    :param max_workers: max number of concurrent API calls
+    :return: stage function, returns the number of sites processed
+    """
+    site_list = synthetic_api.get_site_list(devices)
+    intent_config = yaml.safe_load(synthetic_api.NETWORK_SETTINGS_INTENT)
+
+    def run(api):
+        sites = network_settings_compliance.get_matching_sites(site_list,
+                                                               intent_config['site_info']['site_name_hierarchy'])
+        site_tree = network_settings_compliance.get_site_tree(site_list)
+        settings_site_ids = {site['id']: network_settings_compliance.get_settings_site_id(site_tree, site['id'])
+                             for site in sites}
+        settings_sites = list(dict.fromkeys(settings_site_ids.values()))
+        sites_network_settings = catalyst_center_apis.run_concurrently_as_completed(
+            functools.partial(network_settings_compliance.get_site_network_settings, api), settings_sites,
+            max_workers)
+        for site_id, site_network_settings, error in sites_network_settings:
+            if error is not None:
+                raise error
+            network_settings_compliance.get_site_compliance(site_network_settings, intent_config)
+        return len(sites)
+    return run
+
+
+def get_benchmark_stages(args):
+    """
+    This function will return the benchmark stages, for the benchmark parameters
+    :param args: benchmark parameters
+    :return: list of stages, {'name': ..., 'unit': ..., 'function': function(api)}
+    """
+    max_workers = device_config_compliance.CATALYST_CENTER_MAX_WORKERS
+    stages = [
+        {'name': 'grouping', 'unit': 'compliance details', 'function': benchmark_grouping(args.devices)},
+        {'name': 'enrichment', 'unit': 'devices', 'function': benchmark_enrichment(args.devices, max_workers)}
+    ]
+    for match_mode in cli_compliance.MATCH_MODES:
+        stages.append({'name': 'config_compare_' + match_mode, 'unit': 'devices',
+                       'function': benchmark_config_compare(args.config_devices, args.config_lines,
+                                                            args.rule_groups, args.intent_commands, match_mode)})
+    stages.append({'name': 'settings_eval', 'unit': 'sites',
+                   'function': benchmark_settings_eval(args.buildings * synthetic_api.DEVICES_PER_BUILDING,
+                                                       max_workers)})
+    return [stage for stage in stages if not args.stages or stage['name'] in args.stages]
+
+
+def run_benchmark(stage, catalyst_center_api, memory_api, repeat=BENCHMARK_REPEAT):
+    """
+    This function will run one benchmark stage, and it will measure the wall time, the throughput and the number of
+    API calls. The stage is timed "repeat" times, the median wall time is reported and used for the throughput.
+    The stage runs one more time, with no API latency, to measure the peak memory with tracemalloc,
+    tracemalloc slows down the code it traces and it would skew the wall time
+    :param stage: stage, see get_benchmark_stages
+    :param catalyst_center_api: synthetic API, with the API latency
+    :param memory_api: synthetic API, with no API latency
+    :param repeat: number of timed runs
+    :return: {'items': ..., 'unit': ..., 'wall_time': median, 'wall_time_min': ..., 'wall_times': [...],
+              'throughput': ..., 'api_calls': ..., 'peak_memory': ...}
+    """
+    wall_times = []
+    for _ in range(max(1, repeat)):
+        api_metrics.reset_api_metrics()
+        start_time = time.perf_counter()
+        items = stage['function'](catalyst_center_api)
+        wall_times.append(time.perf_counter() - start_time)
+    wall_time = statistics.median(wall_times)
+    api_calls = sum(metrics['calls'] for metrics in api_metrics.get_api_metrics().values())
+
+    tracemalloc.start()
+    stage['function'](memory_api)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    api_metrics.reset_api_metrics()
+
+    return {'items': items, 'unit': stage['unit'], 'wall_time': round(wall_time, 4),
+            'wall_time_min': round(min(wall_times), 4), 'wall_times': [round(item, 4) for item in wall_times],
+            'throughput': round(items / wall_time, 2) if wall_time else None, 'api_calls': api_calls,
+            'peak_memory': peak_memory}
+
+
+def load_benchmark_results(results_file):
+    """
+    This function will load the benchmark results saved by a previous run
+    :param results_file: results file name
+    :return: benchmark results
+    """
+    with open(results_file, 'r') as f:
+        return json.load(f)
+
+
+def compare_benchmark_results(previous_results, results, threshold=REGRESSION_THRESHOLD,
+                              min_time=REGRESSION_MIN_TIME, min_memory=REGRESSION_MIN_MEMORY):
+    """
+    This function will compare the benchmark results with the results of a previous run, with the same parameters.
+    A stage regressed if the median wall time or the peak memory increased by more than the threshold, and by more
+    than the min absolute increase, or if the number of API calls increased
+    :param previous_results: benchmark results saved by a previous run
+    :param results: benchmark results for this run
+    :param threshold: relative increase reported as a regression, 0.2 for 20%
+    :param min_time: min wall time increase reported as a regression, in seconds
+    :param min_memory: min peak memory increase reported as a regression, in bytes
+    :return: list of regressions, {'stage': ..., 'metric': ..., 'previous': ..., 'current': ...}
+    """
+    if previous_results.get('parameters') != results['parameters']:
+        logging.info(' The previous benchmark parameters are different, the results may not be comparable')
+    regressions = []
+    for name, result in results['stages'].items():
+        previous_result = previous_results.get('stages', {}).get(name)
+        if previous_result is None:
+            continue
+        for metric, min_increase in [('wall_time', min_time), ('peak_memory', min_memory)]:
+            if result[metric] > previous_result[metric] * (1 + threshold) and \
+                    result[metric] - previous_result[metric] > min_increase:
+                regressions.append({'stage': name, 'metric': metric, 'previous': previous_result[metric],
+                                    'current': result[metric]})
+        if result['api_calls'] > previous_result['api_calls']:
+            regressions.append({'stage': name, 'metric': 'api_calls', 'previous': previous_result['api_calls'],
+                                'current': result['api_calls']})
+    return regressions
+
+
+def main():
+    """
+    This app will benchmark the compliance apps stages against a synthetic inventory, with a simulated API latency:
+     - grouping: the compliance details grouping, the inventory join and the non-compliant devices reports
+     - enrichment: the device location and fabric roles API calls
+     - config_compare_index, config_compare_difflib: the rule groups checked against the device running configs
+     - settings_eval: the site hierarchy scan and the network settings rules
+    For each stage it reports the median wall time of several runs, the throughput, the number of API calls and the
+    peak memory.
+    The results are saved to a JSON file, and compared with the results of a previous run to find regressions.
+    The app exits with status 1 if any stage regressed.
+    :return: list of regressions
+    """
+
+    # logging, debug level, to file {application_run.log}
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description='Benchmark the compliance apps stages against a synthetic inventory')
+    parser.add_argument('--devices', type=int, default=10000,
+                        help='number of devices, for the grouping and enrichment stages')
+    parser.add_argument('--config-devices', type=int, default=100,
+                        help='number of device configs, for the config compare stages')
+    parser.add_argument('--config-lines', type=int, default=synthetic_api.SYNTHETIC_CONFIG_LINES,
+                        help='running config lines for each device')
+    parser.add_argument('--rule-groups', type=int, default=3, help='number of rule groups')
+    parser.add_argument('--intent-commands', type=int, default=20, help='number of intent commands per rule group')
+    parser.add_argument('--buildings', type=int, default=100,
+                        help='number of buildings, each with ' + str(synthetic_api.FLOORS_PER_BUILDING) +
+                             ' floors, for the settings stage')
+    parser.add_argument('--latency', type=float, default=0.005, help='simulated latency of each API call, in seconds')
+    parser.add_argument('--repeat', type=int, default=BENCHMARK_REPEAT,
+                        help='number of timed runs of each stage, the median wall time is reported')
+    parser.add_argument('--stages', nargs='*', help='stages to run, default all')
+    parser.add_argument('--output', default=BENCHMARK_RESULTS_FILE, help='file to save the results to')
+    parser.add_argument('--baseline', help='results file of a previous run, to compare with')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='relative wall time or peak memory increase reported as a regression')
+    parser.add_argument('--min-time', type=float, default=REGRESSION_MIN_TIME,
+                        help='min wall time increase reported as a regression, in seconds')
+    parser.add_argument('--min-memory', type=int, default=REGRESSION_MIN_MEMORY,
+                        help='min peak memory increase reported as a regression, in bytes')
+    args = parser.parse_args()
+
+    parameters = {'devices': args.devices, 'config_devices': args.config_devices, 'config_lines': args.config_lines,
+                  'rule_groups': args.rule_groups, 'intent_commands': args.intent_commands,
+                  'buildings': args.buildings, 'latency': args.latency, 'repeat': args.repeat}
+    logging.info(' Compliance benchmark, parameters: ' + json.dumps(parameters))
+
+    catalyst_center_api = get_benchmark_api(args.devices, args.latency, args.config_lines)
+    memory_api = get_benchmark_api(args.devices, 0, args.config_lines)
+    results = {'parameters': parameters, 'python_version': platform.python_version(),
+               'date_time': str(datetime.now().replace(microsecond=0)), 'stages': {}}
+    for stage in get_benchmark_stages(args):
+        result = run_benchmark(stage, catalyst_center_api, memory_api, args.repeat)
+        results['stages'][stage['name']] = result
+        logging.info('   ' + stage['name'] + ': ' + str(result['wall_time']) + ' sec, ' + str(result['throughput']) +
+                     ' ' + result['unit'] + '/sec, API calls: ' + str(result['api_calls']) + ', peak memory: ' +
+                     str(round(result['peak_memory'] / 1024 / 1024, 2)) + ' MB')
+
+    with open(args.output, 'w') as f:
+        f.write(json.dumps(results, indent=4))
+    logging.info(' Saved the benchmark results to file "' + args.output + '"')
+
+    regressions = []
+    if args.baseline:
+        regressions = compare_benchmark_results(load_benchmark_results(args.baseline), results, args.threshold,
+                                                args.min_time, args.min_memory)
+        for regression in regressions:
+            logging.info(' Regression, stage "' + regression['stage'] + '" ' + regression['metric'] + ': ' +
+                         str(regression['previous']) + ' -> ' + str(regression['current']))
+        logging.info(' Compared with "' + args.baseline + '", number of regressions: ' + str(len(regressions)))
+    return regressions
+
+
+if __name__ == '__main__':
+    if main():
+        sys.exit(1)
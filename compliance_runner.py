@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+               https://developer.cisco.com/docs/licenses
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+__author__ = "Gabriel Zapodeanu TME, ENB"
+__email__ = "gzapodea@cisco.com"
+__version__ = "0.1.0"
+__copyright__ = "Copyright (c) 2023 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.1"
+
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+import api_metrics
+import catalyst_center_apis
+import catalyst_center_compliance
+import cli_compliance
+import device_config_compliance
+import github_apis
+import network_settings_compliance
+
+load_dotenv('environment.env')
+
+CATALYST_CENTER_URL = os.getenv('CATALYST_CENTER_URL')
+CATALYST_CENTER_USER = os.getenv('CATALYST_CENTER_USER')
+CATALYST_CENTER_PASS = os.getenv('CATALYST_CENTER_PASS')
+
+GITHUB_USERNAME = os.getenv('GITHUB_USERNAME')
+GITHUB_REPO = os.getenv('GITHUB_REPO')
+
+MAX_STAGES = 4  # max number of stages running concurrently
+
+
+def run_stage(stage, results):
+    """
+    This function will run one stage, and it will measure the stage run time. The stage run time is also recorded
+    to the "compliance_runner.<stage name>" span metrics
+    :param stage: stage, {'name': ..., 'requires': [stage names], 'function': function(results)}
+    :param results: results of the completed stages, {stage name: result}
+    :return: stage result, start time, end time
+    """
+    start_time = time.perf_counter()
+    with api_metrics.span('compliance_runner.' + stage['name']):
+        result = stage['function'](results)
+    return result, start_time, time.perf_counter()
+
+
+def run_stages(stages, max_workers=MAX_STAGES):
+    """
+    This function will run the stages of a DAG. Each stage starts as soon as all the stages it requires are
+    completed, the independent stages run concurrently. The stages depending on a failed stage are skipped.
+    The stages must be listed after the stages they require
+    :param stages: list of stages, {'name': ..., 'requires': [stage names], 'function': function(results)}
+    :param max_workers: max number of stages running concurrently
+    :return: results, {stage name: result}, and timings,
+             {stage name: {'status': 'completed'|'failed'|'skipped', 'start': ..., 'wall_time': ..., 'error': ...}}
+    """
+    stage_names = set()
+    for stage in stages:
+        for required in stage['requires']:
+            if required not in stage_names:
+                raise ValueError('Stage "' + stage['name'] + '" requires the unknown or later stage "' + required + '"')
+        stage_names.add(stage['name'])
+
+    results = {}
+    timings = {}
+    pending = list(stages)
+    running = {}
+    run_start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        while pending or running:
+            for stage in list(pending):
+                required_status = [timings.get(required, {}).get('status') for required in stage['requires']]
+                if 'failed' in required_status or 'skipped' in required_status:
+                    pending.remove(stage)
+                    timings[stage['name']] = {'status': 'skipped', 'start': None, 'wall_time': 0}
+                    logging.info(' Stage "' + stage['name'] + '" skipped')
+                elif all(status == 'completed' for status in required_status):
+                    pending.remove(stage)
+                    running[executor.submit(run_stage, stage, results)] = stage
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                error = future.exception()
+                if error is None:
+                    results[stage['name']], start_time, end_time = future.result()
+                    timings[stage['name']] = {'status': 'completed', 'start': round(start_time - run_start_time, 4),
+                                              'wall_time': round(end_time - start_time, 4)}
+                else:
+                    logging.info(' Stage "' + stage['name'] + '" failed: ' + str(error))
+                    timings[stage['name']] = {'status': 'failed', 'start': None, 'wall_time': 0,
+                                              'error': str(error)}
+    return results, timings
+
+
+def log_stage_timings(stages, timings):
+    """
+    This function will log the stages timing summary
+    :param stages: list of stages
+    :param timings: stages timings, see run_stages
+    :return:
+    """
+    logging.info(' Stages timing summary:')
+    for stage in stages:
+        timing = timings[stage['name']]
+        if timing['status'] == 'completed':
+            logging.info('   ' + stage['name'] + ': ' + str(timing['wall_time']) + ' sec, started at ' +
+                         str(timing['start']) + ' sec')
+        else:
+            logging.info('   ' + stage['name'] + ': ' + timing['status'])
+
+
+def get_compliance_stages(match_mode=cli_compliance.MATCH_MODE_INDEX, full_run=False, delta_mode=False):
+    """
+    This function will return the compliance stages. The GitHub repo, the intent files, the device inventory
+    and the site list are collected once, and shared by the compliance checks
+    :param match_mode: device config match mode, "index" or "difflib"
+    :param full_run: True to validate the configs of all devices, ignoring the state store
+    :param delta_mode: True to create only the non-compliant devices changes report
+    :return: list of stages
+    """
+    def check_github_repo(results):
+        if github_apis.get_repo(username=GITHUB_USERNAME, repo_name=GITHUB_REPO) is None:
+            raise ValueError('Repo "' + GITHUB_REPO + '" not found!')
+        logging.info(' Repo "' + GITHUB_REPO + '" found!')
+
+    def get_catalyst_center_api(results):
+        return catalyst_center_apis.get_catalyst_center_api(CATALYST_CENTER_URL, CATALYST_CENTER_USER,
+                                                             CATALYST_CENTER_PASS)
+
+    def get_device_list(results):
+        return catalyst_center_apis.get_device_list(results['catalyst_center_api'])
+
+    def get_site_list(results):
+        return catalyst_center_apis.get_site_list(results['catalyst_center_api'])
+
+    # the non-compliant devices reports wait for the site list only if a report is filtered or grouped by site
+    report_specs = catalyst_center_compliance.load_report_specs(catalyst_center_compliance.COMPLIANCE_REPORTS_FILE)
+    reports_use_sites = not delta_mode and catalyst_center_compliance.report_specs_use_field(report_specs, 'site')
+
+    def run_compliance_reports(results):
+        return catalyst_center_compliance.run_compliance_reports(
+            results['catalyst_center_api'], device_list=results['device_list'],
+            site_list=results['site_list'] if reports_use_sites else None, delta_mode=delta_mode)
+
+    def run_device_config_compliance(results):
+        file_content, intent_config = results['device_config_intent']
+        return device_config_compliance.run_device_config_compliance(
+            results['catalyst_center_api'], file_content, intent_config, device_list=results['device_list'],
+            match_mode=match_mode, full_run=full_run)
+
+    def run_network_settings_compliance(results):
+        return network_settings_compliance.run_network_settings_compliance(
+            results['catalyst_center_api'], results['network_settings_intent'], site_list=results['site_list'])
+
+    return [
+        {'name': 'github_repo', 'requires': [], 'function': check_github_repo},
+        {'name': 'catalyst_center_api', 'requires': [], 'function': get_catalyst_center_api},
+        {'name': 'device_config_intent', 'requires': ['github_repo'],
+         'function': lambda results: device_config_compliance.get_intent_file()},
+        {'name': 'network_settings_intent', 'requires': ['github_repo'],
+         'function': lambda results: network_settings_compliance.get_intent_config()},
+        {'name': 'device_list', 'requires': ['catalyst_center_api'], 'function': get_device_list},
+        {'name': 'site_list', 'requires': ['catalyst_center_api'], 'function': get_site_list},
+        {'name': 'compliance_reports',
+         'requires': ['catalyst_center_api', 'device_list'] + (['site_list'] if reports_use_sites else []),
+         'function': run_compliance_reports},
+        {'name': 'device_config_compliance', 'requires': ['catalyst_center_api', 'device_config_intent',
+                                                         'device_list'],
+         'function': run_device_config_compliance},
+        {'name': 'network_settings_compliance', 'requires': ['catalyst_center_api', 'network_settings_intent',
+                                                            'site_list'],
+         'function': run_network_settings_compliance}
+    ]
+
+
+def main(match_mode=cli_compliance.MATCH_MODE_INDEX, full_run=False, delta_mode=False):
+    """
+    This app will run the Catalyst Center non-compliant devices report, the device config compliance and the
+    network settings compliance in one process. The Catalyst Center token, the GitHub repo check, the intent files,
+    the device inventory and the site list are collected once, and shared by the three compliance checks.
+    The checks run as stages of a DAG, each stage starts as soon as its inputs are available, and the independent
+    stages run concurrently.
+    The app may be part of a CI/CD pipeline to run on-demand or scheduled.
+    :param match_mode: device config match mode, "index" or "difflib"
+    :param full_run: True to validate the configs of all devices, ignoring the state store
+    :param delta_mode: True to create only the non-compliant devices changes report
+    """
+
+    # logging, debug level, to file {application_run.log}
+    logging.basicConfig(level=logging.INFO)
+
+    current_time = str(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    logging.info(' Application "compliance_runner.py" Start, ' + current_time)
+
+    stages = get_compliance_stages(match_mode=match_mode, full_run=full_run, delta_mode=delta_mode)
+    _, timings = run_stages(stages)
+
+    log_stage_timings(stages, timings)
+    api_metrics.log_api_metrics()
+    api_metrics.export_metrics()
+
+    date_time = str(datetime.now().replace(microsecond=0))
+    logging.info(' End of Application "compliance_runner.py" Run: ' + date_time)
+
+    return
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run all the compliance checks in one process')
+    parser.add_argument('--match-mode', choices=cli_compliance.MATCH_MODES, default=cli_compliance.MATCH_MODE_INDEX,
+                        help='device config matching engine')
+    parser.add_argument('--full-run', action='store_true',
+                        help='validate the configs of all devices, ignoring the results saved by the previous runs')
+    parser.add_argument('--delta', action='store_true',
+                        help='create only the report of the compliance changes since the previous delta run')
+    args = parser.parse_args()
+    main(match_mode=args.match_mode, full_run=args.full_run, delta_mode=args.delta)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+               https://developer.cisco.com/docs/licenses
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+__author__ = "Gabriel Zapodeanu TME, ENB"
+__email__ = "gzapodea@cisco.com"
+__version__ = "0.1.0"
+__copyright__ = "Copyright (c) 2023 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.1"
+
+import hashlib
+import json
+import sqlite3
+import time
+
+
+def get_hash(*items):
+    """
+    This function will return the SHA256 hash of the text items
+    :param items: text items
+    :return: hash, hex string
+    """
+    content_hash = hashlib.sha256()
+    for item in items:
+        content_hash.update(item.encode())
+        content_hash.update(b'\0')
+    return content_hash.hexdigest()
+
+
+def open_state_store(db_file):
+    """
+    This function will open the SQLite state store, and it will create the devices state table if needed.
+    The "rule_groups" column is added to the state stores created by the previous versions
+    :param db_file: state store file name
+    :return: SQLite connection
+    """
+    connection = sqlite3.connect(db_file)
+    connection.execute('CREATE TABLE IF NOT EXISTS device_state ('
+                       'device_id TEXT PRIMARY KEY, '
+                       'hostname TEXT, '
+                       'last_update_time TEXT, '
+                       'config_hash TEXT, '
+                       'intent_hash TEXT, '
+                       'results TEXT, '
+                       'checked_at REAL, '
+                       'rule_groups TEXT)')
+    columns = [row[1] for row in connection.execute('PRAGMA table_info(device_state)')]
+    if 'rule_groups' not in columns:
+        connection.execute('ALTER TABLE device_state ADD COLUMN rule_groups TEXT')
+    return connection
+
+
+def get_devices_state(connection):
+    """
+    This function will return the state of all devices saved in the state store
+    :param connection: SQLite connection
+    :return: {device_id: {'hostname': ..., 'last_update_time': ..., 'config_hash': ..., 'intent_hash': ...,
+                          'results': ..., 'checked_at': ..., 'rule_groups': [rule group names]}}
+    """
+    devices_state = {}
+    cursor = connection.execute('SELECT device_id, hostname, last_update_time, config_hash, intent_hash, results, '
+                                'checked_at, rule_groups FROM device_state')
+    for device_id, hostname, last_update_time, config_hash, intent_hash, results, checked_at, rule_groups in cursor:
+        devices_state[device_id] = {'hostname': hostname, 'last_update_time': last_update_time,
+                                    'config_hash': config_hash, 'intent_hash': intent_hash,
+                                    'results': json.loads(results), 'checked_at': checked_at,
+                                    'rule_groups': json.loads(rule_groups) if rule_groups else None}
+    return devices_state
+
+
+def save_device_state(connection, device_id, hostname, last_update_time, config_hash, intent_hash, results,
+                      rule_groups):
+    """
+    This function will save the device config hash and compliance results to the state store
+    :param connection: SQLite connection
+    :param device_id: device id
+    :param hostname: device hostname
+    :param last_update_time: device last update time reported by Catalyst Center
+    :param config_hash: device config hash
+    :param intent_hash: intent hash
+    :param results: device compliance results
+    :param rule_groups: names of the rule groups checked for the device
+    :return:
+    """
+    connection.execute('INSERT OR REPLACE INTO device_state (device_id, hostname, last_update_time, config_hash, '
+                       'intent_hash, results, checked_at, rule_groups) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                       (device_id, hostname, last_update_time, config_hash, intent_hash, json.dumps(results),
+                        time.time(), json.dumps(sorted(rule_groups))))
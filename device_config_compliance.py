@@ -20,18 +20,21 @@ __version__ = "0.1.0"
 __copyright__ = "Copyright (c) 2023 Cisco and/or its affiliates."
 __license__ = "Cisco Sample Code License, Version 1.1"
 
-import difflib
+import argparse
+import functools
 import json
 import logging
 import os
 import time
 from datetime import datetime
 
-import yaml
-from dnacentersdk import DNACenterAPI
 from dotenv import load_dotenv
 from requests.auth import HTTPBasicAuth  # for Basic Auth
 
+import api_metrics
+import catalyst_center_apis
+import cli_compliance
+import compliance_state
 import github_apis
 
 load_dotenv('environment.env')
@@ -45,6 +48,11 @@ GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
 GITHUB_REPO = os.getenv('GITHUB_REPO')
 
 NETWORK_CONFIGS_PATH = 'network_configs/'
+STATE_DB_FILE = NETWORK_CONFIGS_PATH + 'compliance_state.db'
+
+CATALYST_CENTER_MAX_WORKERS = int(os.getenv('CATALYST_CENTER_MAX_WORKERS', '8'))  # max concurrent API calls
+SAVE_DEVICE_CONFIGS = os.getenv('SAVE_DEVICE_CONFIGS', 'True').lower() == 'true'  # archive the configs to files
+PUSH_COMPLIANCE_REPORTS = os.getenv('PUSH_COMPLIANCE_REPORTS', 'False').lower() == 'true'  # push the files to GitHub
 
 os.environ['TZ'] = 'America/Los_Angeles'  # define the timezone for PST
 time.tzset()  # adjust the timezone, more info https://help.pythonanywhere.com/pages/SettingTheTimezone/
@@ -53,8 +61,322 @@ CATALYST_CENTER_AUTH = HTTPBasicAuth(CATALYST_CENTER_USER, CATALYST_CENTER_PASS)
 FILE_NAME = 'custom_network_compliance.yaml'
 
 
+def get_device_details(catalyst_center_api, device):
+    """
+    This function will return the device details, including the device location and fabric roles.
+    The API call errors are recorded in the device details "errors", instead of failing the inventory collection
+    :param catalyst_center_api: Catalyst Center SDK connection object
+    :param device: device, as returned by the device list API
+    :return: device details
+    """
+    device_details = {'hostname': device['hostname']}
+    device_details.update({'device_ip': device['managementIpAddress']})
+    device_details.update({'device_id': device['id']})
+    device_details.update({'version': device['softwareVersion']})
+    device_details.update({'device_family': device['type']})
+    device_details.update({'role': device['role']})
+    errors = {}
+
+    # get the device site hierarchy
+    site = None
+    try:
+        response = catalyst_center_api.devices.get_device_detail(identifier='uuid', search_by=device['id'])
+        site = response['response']['location']
+    except Exception as e:
+        errors.update({'site': str(e)})
+    device_details.update({'site': site})
+
+    # get the device fabric role
+    device_sda_roles = []
+    try:
+        response = catalyst_center_api.sda.get_device_role_in_sda_fabric(
+            device_management_ip_address=device['managementIpAddress'])
+        device_sda_roles = response['roles']
+    except Exception as e:
+        errors.update({'sda_roles': str(e)})
+    device_details.update({'sda_roles': device_sda_roles})
+
+    if errors:
+        device_details.update({'errors': errors})
+    return device_details
+
+
+def get_device_config(catalyst_center_api, device):
+    """
+    This function will return the device running config
+    :param catalyst_center_api: Catalyst Center SDK connection object
+    :param device: device details, from the device inventory
+    :return: running config
+    """
+    response = catalyst_center_api.devices.get_device_config_by_id(device['device_id'])
+    return response['response']
+
+
+def get_compliance_policies(intent_config, rule_groups):
+    """
+    This function will return the compliance policies from the intent config. Each policy has a device filter and
+    the list of rule groups to validate. The device filter fields are optional, a missing field matches all devices.
+    If the intent config has no "policies", one policy is created from the "device_filter", with all the rule groups
+    :param intent_config: intent config, parsed from the intent YAML file
+    :param rule_groups: rule groups, see cli_compliance.get_rule_groups
+    :return: list of policies, {'device_role': ..., 'device_family': ..., 'rule_groups': [rule group names]}
+    """
+    rule_groups_names = [rule_group['name'] for rule_group in rule_groups]
+    intent_policies = intent_config.get('policies')
+    if intent_policies is None:
+        intent_policies = [{'device_filter': intent_config.get('device_filter', {})}]
+
+    policies = []
+    for intent_policy in intent_policies:
+        device_filter = intent_policy.get('device_filter') or {}
+        policy_rule_groups = intent_policy.get('rule_groups', rule_groups_names)
+        unknown_rule_groups = [name for name in policy_rule_groups if name not in rule_groups_names]
+        if unknown_rule_groups:
+            raise ValueError('Unknown rule groups in the compliance policy: ' + ', '.join(unknown_rule_groups))
+        policies.append({'device_role': device_filter.get('device_role'),
+                         'device_family': device_filter.get('device_family'),
+                         'rule_groups': policy_rule_groups})
+    return policies
+
+
+def get_policies_devices(policies, device_inventory):
+    """
+    This function will match the devices with the compliance policies, in one pass over the device inventory.
+    The devices are indexed by (role, device family), each policy selects the matching index buckets
+    :param policies: compliance policies, see get_compliance_policies
+    :param device_inventory: device inventory
+    :return: {device_id: [rule group names]}, for the devices matching at least one policy
+    """
+    devices_index = {}
+    for item in device_inventory:
+        devices_index.setdefault((item['role'], item['device_family']), []).append(item)
+
+    device_rule_groups = {}
+    for policy in policies:
+        for (role, family), devices in devices_index.items():
+            if policy['device_role'] not in (None, role) or policy['device_family'] not in (None, family):
+                continue
+            for item in devices:
+                item_rule_groups = device_rule_groups.setdefault(item['device_id'], [])
+                for name in policy['rule_groups']:
+                    if name not in item_rule_groups:
+                        item_rule_groups.append(name)
+    return device_rule_groups
+
+
+def is_device_state_valid(device_state, intent_hash, rule_groups):
+    """
+    This function will verify if the device results saved to the state store may be reused: the intent is the same,
+    and the device is checked against the same rule groups. The rule groups change when the device role or family
+    changes, or when the policies change
+    :param device_state: device state, see compliance_state.get_devices_state
+    :param intent_hash: intent hash
+    :param rule_groups: names of the rule groups to check for the device
+    :return: True or False
+    """
+    return bool(device_state) and device_state['intent_hash'] == intent_hash and \
+        device_state['rule_groups'] == sorted(rule_groups)
+
+
+def add_device_results(compliance_report, item, rule_groups_by_name, device_rule_groups, device_results,
+                       from_state=False):
+    """
+    This function will add the device compliance results to the compliance report, and log the results
+    :param compliance_report: compliance report
+    :param item: device details, from the device inventory
+    :param rule_groups_by_name: {rule group name: rule group}
+    :param device_rule_groups: {device_id: [rule group names]}, see get_policies_devices
+    :param device_results: device compliance results, see cli_compliance.check_rule_groups
+    :param from_state: True if the results are reused from the state store
+    :return:
+    """
+    compliance_report['devices'][item['hostname']] = device_results
+    for name in device_rule_groups[item['device_id']]:
+        result = device_results[name]
+        group_report = compliance_report['rule_groups'][name]
+        if not from_state:
+            group_report['check_time'] += result['check_time']
+        if result['status'] == 'passed':
+            group_report['devices_passed'] += 1
+            logging.info('    - ' + rule_groups_by_name[name]['label'] + ' check passed')
+        else:
+            group_report['devices_failed'] += 1
+            logging.info('    - ' + rule_groups_by_name[name]['label'] + ' check failed, missing commands:')
+            for command in result['missing_commands']:
+                logging.info('        - ' + command)
+
+
+def get_intent_file():
+    """
+    This function will return the device config compliance intent file from GitHub
+    :return: file content, parsed YAML
+    """
+    file_content, intent_config = github_apis.get_repo_yaml_file(username=GITHUB_USERNAME,
+                                                                 repo_name=GITHUB_REPO,
+                                                                 file_name=FILE_NAME)
+    logging.info(' File "' + FILE_NAME + '" found!')
+    return file_content, intent_config
+
+
+def run_device_config_compliance(catalyst_center_api, file_content, intent_config, device_list=None,
+                                 match_mode=cli_compliance.MATCH_MODE_INDEX, full_run=False):
+    """
+    This function will validate the device configs against the intent, and it will save the compliance report.
+    The device inventory may be collected once by the caller, and shared with other compliance checks
+    :param catalyst_center_api: Catalyst Center SDK connection object
+    :param file_content: intent file content
+    :param intent_config: intent config, parsed from the intent file
+    :param device_list: optional device list, see catalyst_center_apis.get_device_list
+    :param match_mode: "index" or "difflib"
+    :param full_run: True to collect and validate all devices, ignoring the state store
+    :return: compliance report
+    """
+    # parse the input data
+    intent_hash = compliance_state.get_hash(file_content, match_mode)
+    rule_groups = cli_compliance.get_rule_groups(intent_config)
+
+    # parse the device policies
+    policies = get_compliance_policies(intent_config, rule_groups)
+
+    logging.info(' Device configs from GitHub:')
+    for rule_group in rule_groups:
+        logging.info('   ' + rule_group['name'] + ': \n' + rule_group['commands'])
+
+    for policy in policies:
+        logging.info(' Compliance device filter:')
+        logging.info('   device_role: ' + str(policy['device_role']))
+        logging.info('   device_family: ' + str(policy['device_family']))
+        logging.info('   rule_groups: ' + ', '.join(policy['rule_groups']))
+
+    # collect device inventory, if not collected by the runner
+    if device_list is None:
+        device_list = catalyst_center_apis.get_device_list(catalyst_center_api)
+        logging.info(' Collected the device list from Catalyst Center')
+
+    # create device inventory, add location and fabric roles, for all devices except APs
+    network_devices = [device for device in device_list if device.family != 'Unified AP']
+    with api_metrics.span('device_config_compliance.device_inventory'):
+        device_inventory = catalyst_center_apis.run_concurrently(
+            functools.partial(get_device_details, catalyst_center_api), network_devices, CATALYST_CENTER_MAX_WORKERS)
+
+    devices_errors = [item for item in device_inventory if 'errors' in item]
+    if devices_errors:
+        api_metrics.increment_counter('device_config_compliance.device_details_errors', len(devices_errors))
+        logging.info(' Number of devices with location or fabric role API errors: ' + str(len(devices_errors)))
+    logging.info(' Retrieved the device location and fabric role')
+
+    # save device inventory to json formatted file, the files saved by this run are pushed to GitHub with one commit
+    push_files = {NETWORK_CONFIGS_PATH + 'device_inventory.json': json.dumps(device_inventory, indent=4)}
+    with open(NETWORK_CONFIGS_PATH + 'device_inventory.json', 'w') as f:
+        f.write(push_files[NETWORK_CONFIGS_PATH + 'device_inventory.json'])
+    logging.info(' Saved the device inventory to file "device_inventory.json"')
+
+    # save the config compliance commands to files
+    if SAVE_DEVICE_CONFIGS:
+        for rule_group in rule_groups:
+            with open(NETWORK_CONFIGS_PATH + rule_group['name'] + '.txt', 'w') as f:
+                f.write(rule_group['commands'])
+
+    # load the devices state from the previous runs
+    state_connection = compliance_state.open_state_store(STATE_DB_FILE)
+    devices_state = {} if full_run else compliance_state.get_devices_state(state_connection)
+    last_update_times = {}
+    for device in network_devices:
+        if device.get('lastUpdateTime') is not None:
+            last_update_times[device['id']] = str(device['lastUpdateTime'])
+
+    # collect the device configs for the devices that match the role, the configs are downloaded concurrently
+    # and each config is checked as soon as it is received
+    logging.info(' Compliance checks for devices that match the device filter')
+    device_rule_groups = get_policies_devices(policies, device_inventory)
+    rule_groups_by_name = {rule_group['name']: rule_group for rule_group in rule_groups}
+    compliance_report = {'match_mode': match_mode, 'policies': policies, 'rule_groups': {}, 'devices': {},
+                         'devices_unchanged': [], 'devices_config_unchanged': []}
+    for rule_group in rule_groups:
+        compliance_report['rule_groups'][rule_group['name']] = {'devices_passed': 0, 'devices_failed': 0,
+                                                                'check_time': 0}
+
+    # the devices not updated since the last run, with the same intent, are reported from the state store
+    compliance_devices = []
+    for item in device_inventory:
+        if item['device_id'] not in device_rule_groups:
+            continue
+        device_state = devices_state.get(item['device_id'])
+        last_update_time = last_update_times.get(item['device_id'])
+        if is_device_state_valid(device_state, intent_hash, device_rule_groups[item['device_id']]) and \
+                last_update_time is not None and device_state['last_update_time'] == last_update_time:
+            logging.info(' Device: ' + item['hostname'] + ' : not updated since the last run')
+            compliance_report['devices_unchanged'].append(item['hostname'])
+            add_device_results(compliance_report, item, rule_groups_by_name, device_rule_groups,
+                               device_state['results'], from_state=True)
+        else:
+            compliance_devices.append(item)
+
+    device_configs = catalyst_center_apis.run_concurrently_as_completed(
+        functools.partial(get_device_config, catalyst_center_api), compliance_devices, CATALYST_CENTER_MAX_WORKERS)
+    for item, device_config, error in device_configs:
+        if error is not None:
+            logging.info(' Unable to collect the device config for ' + item['hostname'] + ': ' + str(error))
+            compliance_report['devices'][item['hostname']] = {'error': str(error)}
+            continue
+        if SAVE_DEVICE_CONFIGS:
+            with open(NETWORK_CONFIGS_PATH + item['hostname'] + '_config.txt', 'w') as f:
+                f.write(device_config)
+            push_files[NETWORK_CONFIGS_PATH + item['hostname'] + '_config.txt'] = device_config
+            logging.info(' Saved the device config ' + item['hostname'] + '_config.txt')
+
+        # check all the rule groups against the device config, if the config or intent changed since the last run
+        config_hash = compliance_state.get_hash(device_config)
+        device_state = devices_state.get(item['device_id'])
+        if is_device_state_valid(device_state, intent_hash, device_rule_groups[item['device_id']]) and \
+                device_state['config_hash'] == config_hash:
+            logging.info(' Device: ' + item['hostname'] + ' : config not changed since the last run')
+            compliance_report['devices_config_unchanged'].append(item['hostname'])
+            device_results = device_state['results']
+            add_device_results(compliance_report, item, rule_groups_by_name, device_rule_groups, device_results,
+                               from_state=True)
+        else:
+            logging.info(' Device: ' + item['hostname'] + ' :')
+            device_groups = [rule_groups_by_name[name] for name in device_rule_groups[item['device_id']]]
+            with api_metrics.span('device_config_compliance.check_rule_groups'):
+                device_results = cli_compliance.check_rule_groups(device_groups, device_config, match_mode)
+            add_device_results(compliance_report, item, rule_groups_by_name, device_rule_groups, device_results)
+        compliance_state.save_device_state(state_connection, item['device_id'], item['hostname'],
+                                           last_update_times.get(item['device_id']), config_hash, intent_hash,
+                                           device_results, device_rule_groups[item['device_id']])
+
+    state_connection.commit()
+    state_connection.close()
+    api_metrics.increment_counter('device_config_compliance.devices_processed', len(compliance_report['devices']))
+    api_metrics.increment_counter('device_config_compliance.state_hits', len(compliance_report['devices_unchanged']) +
+                                  len(compliance_report['devices_config_unchanged']))
+    logging.info(' Devices not updated since the last run: ' + str(len(compliance_report['devices_unchanged'])) +
+                 ', devices with unchanged config: ' + str(len(compliance_report['devices_config_unchanged'])))
+
+    # save the compliance report to json formatted file
+    for group_report in compliance_report['rule_groups'].values():
+        group_report['check_time'] = round(group_report['check_time'], 6)
+    push_files[NETWORK_CONFIGS_PATH + 'device_compliance_report.json'] = json.dumps(compliance_report, indent=4)
+    with open(NETWORK_CONFIGS_PATH + 'device_compliance_report.json', 'w') as f:
+        f.write(push_files[NETWORK_CONFIGS_PATH + 'device_compliance_report.json'])
+    logging.info(' Saved the compliance report to file "device_compliance_report.json"')
+
+    # push the compliance report, the device inventory and the device configs to GitHub
+    if PUSH_COMPLIANCE_REPORTS:
+        with api_metrics.span('device_config_compliance.push_files'):
+            commit_sha = github_apis.github_push_files(GITHUB_REPO, push_files,
+                                                       'Device config compliance report ' +
+                                                       str(datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+        if commit_sha:
+            logging.info(' Pushed ' + str(len(push_files)) + ' files to GitHub, commit: ' + commit_sha)
+        else:
+            logging.info(' No changes to push to GitHub')
+
+    return compliance_report
+
+
 # noinspection PyTypeChecker
-def main():
+def main(match_mode=cli_compliance.MATCH_MODE_INDEX, full_run=False):
     """
     This application will get device config CLI configurations form GitHub. It will identify if devices are configured with
     the CLI commands based on specific rules.
@@ -80,8 +402,32 @@ def main():
             ntp server 171.68.38.66
             ntp server 171.68.48.78
         ...
+    Each top level key with "commands" is a rule group, all the rule groups are validated for each device.
+    Multiple device filters may be defined as "policies", each with the list of rule groups to validate:
+        policies:
+          - device_filter:
+              device_role: ACCESS
+              device_family: Cisco Catalyst 9300 Switch
+            rule_groups: [aaa_config, ntp_config]
+          - device_filter:
+              device_role: CORE
+            rule_groups: [aaa_config]
+    The device configs are collected only once, for the devices matching one or more policies.
+    The intent commands may include indented sections commands. An optional "section" will validate the commands
+    under each config section matching the section path, for example:
+        vty_config:
+          section:
+            - line vty *
+          commands: |
+            transport input ssh
     The app may be part of a CI/CD pipeline to run on-demand or scheduled.
     This app is using the Python SDK to make REST API calls to Cisco DNA Center.
+    The device config hash and compliance results are saved to a local state store. The devices not updated since
+    the last run, with the same intent, are not collected again. The results for the devices with an unchanged
+    config are reused from the state store.
+    :param match_mode: "index" to match the commands against an index of the running config lines,
+                       "difflib" to compare the commands with the running config using difflib
+    :param full_run: True to collect and validate all devices, ignoring the state store
     """
 
     # logging, debug level, to file {application_run.log}
@@ -89,151 +435,26 @@ def main():
 
     current_time = str(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
     logging.info(' Application "device_config_compliance.py" Start, ' + current_time)
-
-    # get the repos for user
-    repos = github_apis.get_private_repos(username=GITHUB_USERNAME, github_token=GITHUB_TOKEN)
+    logging.info(' Config match mode: ' + match_mode)
 
     # verify if repo exists
-    if GITHUB_REPO not in repos:
+    if github_apis.get_repo(username=GITHUB_USERNAME, repo_name=GITHUB_REPO) is None:
         logging.info(' Repo "' + GITHUB_REPO + '" not found!')
         return
     logging.info(' Repo "' + GITHUB_REPO + '" found!')
 
     # get the device config  compliance intent file
-    file_content = github_apis.get_repo_file_content(username=GITHUB_USERNAME,
-                                                     repo_name=GITHUB_REPO,
-                                                     file_name=FILE_NAME)
-    logging.info(' File "' + FILE_NAME + '" found!')
-
-    # parse the input data
-    intent_config = yaml.safe_load(file_content)
-    aaa_config = intent_config['aaa_config']['commands']
-    ntp_config = intent_config['ntp_config']['commands']
-
-    # parse the device policy
-    device_role = intent_config['device_filter']['device_role']
-    device_family = intent_config['device_filter']['device_family']
-
-    logging.info(' Device configs from GitHub:')
-    logging.info('   aaa_config: \n' + aaa_config)
-    logging.info('   ntp_config: \n' + ntp_config)
-
-    # save the config compliance to files
-    with open(NETWORK_CONFIGS_PATH + 'aaa_config.txt', 'w') as f:
-        f.write(aaa_config)
-
-    # save the config compliance to files
-    with open(NETWORK_CONFIGS_PATH + 'ntp_config.txt', 'w') as f:
-        f.write(ntp_config)
-
-    logging.info(' Compliance device filter:')
-    logging.info('   device_role: ' + device_role)
-    logging.info('   device_family: ' + device_family)
+    file_content, intent_config = get_intent_file()
 
     # create a DNACenterAPI "Connection Object" to use the Python SDK
-    catalyst_center_api = DNACenterAPI(username=CATALYST_CENTER_USER, password=CATALYST_CENTER_PASS,
-                                       base_url=CATALYST_CENTER_URL, version='2.3.5.3',
-                                       verify=False)
-
-    # collect device inventory
-    # get the device count
-    response = catalyst_center_api.devices.get_device_count()
-    device_count = response['response']
-    logging.info(' Number of devices managed by Catalyst Center: ' + str(device_count))
-
-    # get the device info list
-    offset = 1
-    limit = 500
-    device_list = []
-    while offset <= device_count:
-        response = catalyst_center_api.devices.get_device_list(offset=offset)
-        offset += limit
-        device_list.extend(response['response'])
-    logging.info(' Collected the device list from Catalyst Center')
-
-    # create device inventory, add location and fabric roles
-
-    device_inventory = []
-    for device in device_list:
-        # select which inventory to add the device to
-        if device.family != "Unified AP":
-            device_id = device['id']
-            device_management_ip_address = device['managementIpAddress']
-
-            device_details = {'hostname': device['hostname']}
-            device_details.update({'device_ip': device['managementIpAddress']})
-            device_details.update({'device_id': device['id']})
-            device_details.update({'version': device['softwareVersion']})
-            device_details.update({'device_family': device['type']})
-            device_details.update({'role': device['role']})
-
-            # get the device site hierarchy
-            response = catalyst_center_api.devices.get_device_detail(identifier='uuid', search_by=device_id)
-            site = response['response']['location']
-            device_details.update({'site': site})
-
-            # get the device fabric role
-            device_sda_roles = []
-            try:
-                response = catalyst_center_api.sda.get_device_role_in_sda_fabric(
-                    device_management_ip_address=device_management_ip_address)
-                device_sda_roles = response['roles']
-            except:
-                pass
-            device_details.update({'sda_roles': device_sda_roles})
-
-            device_inventory.append(device_details)
-
-    logging.info(' Retrieved the device location and fabric role')
-
-    # save device inventory to json formatted file
-    with open(NETWORK_CONFIGS_PATH + 'device_inventory.json', 'w') as f:
-        f.write(json.dumps(device_inventory, indent=4))
-    logging.info(' Saved the device inventory to file "device_inventory.json"')
+    catalyst_center_api = catalyst_center_apis.get_catalyst_center_api(CATALYST_CENTER_URL, CATALYST_CENTER_USER,
+                                                                        CATALYST_CENTER_PASS)
 
-    os.chdir(NETWORK_CONFIGS_PATH)
-
-    # collect the device configs for the devices that match the role
-    logging.info(' Compliance checks for devices that match the device filter')
-    for item in device_inventory:
-        if item['role'] == device_role and item['device_family'] == device_family:
-            response = catalyst_center_api.devices.get_device_config_by_id(item['device_id'])
-            device_config = response['response']
-            with open(item['hostname'] + '_config.txt', 'w') as f:
-                f.write(device_config)
-            logging.info(' Saved the device config ' + item['hostname'] + '_config.txt')
-            logging.info(' Device: ' + item['hostname'] + ' :')
+    run_device_config_compliance(catalyst_center_api, file_content, intent_config, match_mode=match_mode,
+                                 full_run=full_run)
 
-            # check common lines between the two files - device config compliance commands and running config
-            aaa_config_file = open('aaa_config.txt', 'r').readlines()
-            ntp_config_file = open('ntp_config.txt', 'r').readlines()
-            config_file = open(item['hostname'] + '_config.txt', 'r').readlines()
-
-            aaa_difference = difflib.Differ()
-            aaa_commands_list = []
-            for line in aaa_difference.compare(aaa_config_file, config_file):
-                if line.startswith('-'):
-                    clean_line = line.strip()
-                    aaa_commands_list.append(clean_line)
-            if len(aaa_commands_list) == 0:
-                logging.info('    - AAA config check passed')
-            else:
-                logging.info('    - AAA config check failed, missing commands:')
-                for command in aaa_commands_list:
-                    logging.info('        ' + command)
-
-            ntp_difference = difflib.Differ(charjunk=lambda x: x in [',', '.', '-', "'"])
-            ntp_commands_list = []
-            for line in ntp_difference.compare(ntp_config_file, config_file):
-                if line.startswith('-'):
-                    clean_line = line.strip()
-                    ntp_commands_list.append(clean_line)
-            if len(ntp_commands_list) == 0:
-                logging.info('    - NTP config check passed')
-            else:
-                logging.info('    - NTP config check failed, missing commands:')
-                for command in ntp_commands_list:
-                    logging.info('        ' + command)
+    api_metrics.log_api_metrics()
+    api_metrics.export_metrics()
 
     date_time = str(datetime.now().replace(microsecond=0))
     logging.info(' End of Application "device_config_compliance.py" Run: ' + date_time)
@@ -242,4 +463,10 @@ def main():
 
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser(description='Device config CLI commands compliance')
+    parser.add_argument('--match-mode', choices=cli_compliance.MATCH_MODES, default=cli_compliance.MATCH_MODE_INDEX,
+                        help='running config matching engine, "difflib" keeps the previous line by line comparison')
+    parser.add_argument('--full-run', action='store_true',
+                        help='collect and validate all devices, ignoring the results saved by the previous runs')
+    args = parser.parse_args()
+    main(match_mode=args.match_mode, full_run=args.full_run)
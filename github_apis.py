@@ -21,17 +21,22 @@ __copyright__ = "Copyright (c) 2023 Cisco and/or its affiliates."
 __license__ = "Cisco Sample Code License, Version 1.1"
 
 import base64
+import json
+import logging
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+import yaml
 
 from dotenv import load_dotenv
-from github import Github
+from github import Github, InputGitTreeElement
+from requests.adapters import HTTPAdapter
 
-load_dotenv('environment.env')
-
-GITHUB_USERNAME = 'zapodeanu'
-GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
+import api_metrics
+import api_replay
 
 load_dotenv('environment.env')
 
@@ -43,21 +48,157 @@ time.tzset()  # adjust the timezone, more info https://help.pythonanywhere.com/p
 
 GITHUB_URL = 'https://api.github.com'
 
+GITHUB_TIMEOUT = float(os.getenv('GITHUB_TIMEOUT', 30))  # connect and read timeout for each API call, seconds
+GITHUB_MAX_RETRIES = int(os.getenv('GITHUB_MAX_RETRIES', 5))  # max number of retries for each API call
+GITHUB_BACKOFF = 1  # first retry delay, doubled for each retry, seconds
+GITHUB_MAX_WAIT = int(os.getenv('GITHUB_MAX_WAIT', 300))  # max wait before a retry, including the rate limit reset
+GITHUB_POOL_SIZE = 16  # max number of pooled connections
+GITHUB_RETRY_STATUS = [429, 500, 502, 503, 504]
+GITHUB_PAGE_SIZE = 100  # max number of items returned by one paginated API call
+GITHUB_MAX_WORKERS = int(os.getenv('GITHUB_MAX_WORKERS', '4'))  # max concurrent API calls
+GITHUB_CACHE_FILE = os.getenv('GITHUB_CACHE_FILE', 'github_cache.json')  # repo files cache, empty to disable
+
+_github_session = None
+_github_session_lock = threading.Lock()
+_github_cache = None
+_github_cache_lock = threading.Lock()
+_commit_cache = {}
+_commit_cache_lock = threading.Lock()
+_github_client = None
+_github_repos = {}
+_github_client_lock = threading.Lock()
+
+
+def get_github_session():
+    """
+    This function will return the GitHub session, created once and shared by all API calls. The session keeps
+    the connections alive, and it sends the Accept and Authorization headers with each call
+    :return: requests session
+    """
+    global _github_session
+    with _github_session_lock:
+        if _github_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=GITHUB_POOL_SIZE, pool_maxsize=GITHUB_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.headers.update({'Accept': 'application/vnd.github+json'})
+            if GITHUB_TOKEN:
+                session.headers.update({'Authorization': 'token ' + GITHUB_TOKEN})
+            _github_session = session
+        return _github_session
+
+
+def get_retry_wait(response, retry):
+    """
+    This function will return how long to wait before retrying a GitHub API call. The "Retry-After" header is
+    used if present, else if the rate limit is exhausted ("X-RateLimit-Remaining: 0") the wait is until the
+    rate limit reset time, else the wait is an exponential backoff
+    :param response: API call response, None if the call failed before a response was received
+    :param retry: retry number, starting with 0
+    :return: wait time in seconds, None if the call should not be retried
+    """
+    backoff = GITHUB_BACKOFF * 2 ** retry
+    if response is None:
+        return backoff
+    retry_after = response.headers.get('Retry-After')
+    if retry_after is not None and retry_after.isdigit():
+        return int(retry_after)
+    if response.status_code in (403, 429) and response.headers.get('X-RateLimit-Remaining') == '0':
+        rate_limit_reset = response.headers.get('X-RateLimit-Reset')
+        if rate_limit_reset is not None and rate_limit_reset.isdigit():
+            return max(int(rate_limit_reset) - time.time(), 0) + 1
+        return backoff
+    if response.status_code in GITHUB_RETRY_STATUS:
+        return backoff
+    return None
+
+
+def github_request(endpoint, url, params=None, headers=None):
+    """
+    This function will call a GitHub REST API GET endpoint using the shared session. The calls failed with connection
+    errors, timeouts, server errors, or rate limit errors are retried, and the latency of each call is recorded
+    :param endpoint: endpoint name, used for the API calls metrics
+    :param url: API URL
+    :param params: optional query parameters
+    :param headers: optional headers, in addition to the session headers
+    :return: response
+    """
+    session = get_github_session()
+    replay_mode = api_replay.get_replay_mode()
+    retry = 0
+    while True:
+        start_time = time.perf_counter()
+        try:
+            if replay_mode in (api_replay.API_REPLAY_REPLAY, api_replay.API_REPLAY_SYNTHETIC):
+                response = api_replay.get_github_response('GET', url, params=params)
+            else:
+                response = session.get(url, params=params, headers=headers, timeout=GITHUB_TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout) as error:
+            api_metrics.record_api_call('github.' + endpoint, time.perf_counter() - start_time, error=True)
+            wait = get_retry_wait(None, retry)
+            if retry >= GITHUB_MAX_RETRIES or wait > GITHUB_MAX_WAIT:
+                raise
+            logging.info(' GitHub API call "' + endpoint + '" failed: ' + str(error))
+        else:
+            api_metrics.record_api_call('github.' + endpoint, time.perf_counter() - start_time,
+                                        error=response.status_code >= 400)
+            if replay_mode == api_replay.API_REPLAY_RECORD:
+                api_replay.record_github_response(response)
+            if response.status_code < 400:
+                return response
+            wait = get_retry_wait(response, retry)
+            if wait is None or retry >= GITHUB_MAX_RETRIES or wait > GITHUB_MAX_WAIT:
+                response.raise_for_status()
+            logging.info(' GitHub API call "' + endpoint + '" failed, status code: ' + str(response.status_code))
+        logging.info(' Retry in ' + str(round(wait, 1)) + ' seconds')
+        api_metrics.increment_counter('github.retries')
+        time.sleep(wait)
+        retry += 1
+
+
+def get_pages(endpoint, url, params=None):
+    """
+    This function will return all items of a paginated GitHub API, one page at a time. The next page URL is
+    read from the "Link" header
+    :param endpoint: endpoint name, used for the API calls metrics
+    :param url: API URL
+    :param params: optional query parameters, the page size is added
+    :return: generator of items
+    """
+    params = dict(params or {}, per_page=GITHUB_PAGE_SIZE)
+    while url:
+        response = github_request(endpoint, url, params=params)
+        yield from response.json()
+        url = response.links.get('next', {}).get('url')
+        params = None  # the next page URL includes the query parameters
+
+
+def get_repo(username, repo_name):
+    """
+    This function will return the repo details, using one API call
+    :param username: repo owner
+    :param repo_name: repository name
+    :return: repo details, None if the repo is not found or not accessible
+    """
+    url = GITHUB_URL + '/repos/' + username + '/' + repo_name
+    try:
+        response = github_request('get_repo', url)
+    except requests.HTTPError as error:
+        if error.response is not None and error.response.status_code == 404:
+            return None
+        raise
+    return response.json()
+
 
 def get_repos(username):
     """
     This function will return all repos for user
     :param: username: user for which to return the repos
-    :return: repos_list
+    :return: generator of repo names
     """
-    url = GITHUB_URL + '/users/' + username + '/repos?per_page=100&sort=updated&direction=desc'
-    header = {'Accept': 'application/vnd.github+json', 'Authorization': 'token ' + GITHUB_TOKEN}
-    response = requests.get(url, headers=header, verify=True)
-    response_json = response.json()
-    repos_list = []
-    for repo in response_json:
-        repos_list.append(repo['name'])
-    return repos_list
+    url = GITHUB_URL + '/users/' + username + '/repos'
+    for repo in get_pages('get_repos', url, params={'sort': 'updated', 'direction': 'desc'}):
+        yield repo['name']
 
 
 def get_private_repos(username, github_token):
@@ -65,16 +206,11 @@ def get_private_repos(username, github_token):
     This function will return private repos for user referred by the User Access Token
     :param: username: user for which to return the repos
     :param: github_token: Personal access token for user
-    :return: repos_list
+    :return: generator of repo names
     """
-    url = GITHUB_URL + '/user/repos?type=private'
-    header = {'Accept': 'application/vnd.github+json', 'Authorization': 'token ' + GITHUB_TOKEN}
-    response = requests.get(url, headers=header, verify=True)
-    response_json = response.json()
-    repos_list = []
-    for repo in response_json:
-        repos_list.append(repo['name'])
-    return repos_list
+    url = GITHUB_URL + '/user/repos'
+    for repo in get_pages('get_private_repos', url, params={'type': 'private'}):
+        yield repo['name']
 
 
 def get_repo_content(username, repo_name):
@@ -82,77 +218,193 @@ def get_repo_content(username, repo_name):
     This function will return the contents of a repository
     :param: username: user for which to return the repos
     :param: repo_name: repository name
-    :return: files_list
+    :return: generator of file names
     """
     url = GITHUB_URL + '/repos/' + username + '/' + repo_name + '/contents'
-    header = {'Accept': 'application/vnd.github+json', 'Authorization': 'token ' + GITHUB_TOKEN}
-    response = requests.get(url, headers=header, verify=True)
-    response_json = response.json()
-    files_list = []
-    for file in response_json:
-        files_list.append(file['name'])
-    return files_list
+    for file in get_pages('get_repo_content', url):
+        yield file['name']
+
+
+def get_github_cache():
+    """
+    This function will return the repo files cache, loaded once from the cache file
+    :return: repo files cache, {"username/repo/file": {'etag': ..., 'content': ...}}
+    """
+    global _github_cache
+    if _github_cache is None:
+        _github_cache = {}
+        if GITHUB_CACHE_FILE and os.path.exists(GITHUB_CACHE_FILE):
+            try:
+                with open(GITHUB_CACHE_FILE, 'r') as f:
+                    _github_cache = {cache_key: {'etag': cached_file.get('etag'), 'content': cached_file['content']}
+                                     for cache_key, cached_file in json.load(f).items()}
+            except (OSError, ValueError, KeyError, AttributeError):
+                logging.info(' Unable to read the GitHub cache file "' + GITHUB_CACHE_FILE + '", ignoring it')
+    return _github_cache
+
+
+def save_github_cache():
+    """
+    This function will save the repo files cache to file, to be reused by the next runs
+    :return:
+    """
+    if GITHUB_CACHE_FILE:
+        with open(GITHUB_CACHE_FILE, 'w') as f:
+            f.write(json.dumps(get_github_cache(), indent=4))
 
 
 def get_repo_file_content(username, repo_name, file_name):
     """
-    This function will return the content of the file from the repo
+    This function will return the content of the file from the repo. The file content is cached with its ETag,
+    and the file is requested with "If-None-Match". An unchanged file returns "304 Not Modified", which does not
+    count against the rate limit, and the cached content is returned
     :param username: GitHub username
     :param repo_name: GitHub repo
     :param file_name: file name
     :return: return the file content
     """
     url = GITHUB_URL + '/repos/' + username + '/' + repo_name + '/contents/' + file_name
-    header = {'Authorization': 'token ' + GITHUB_TOKEN}
-    response = requests.get(url, headers=header)
+    cache_key = username + '/' + repo_name + '/' + file_name
+    with _github_cache_lock:
+        cached_file = get_github_cache().get(cache_key)
+    # in record mode the file is always requested, the "304 Not Modified" responses are not recorded
+    header = None
+    if cached_file and cached_file.get('etag') and api_replay.get_replay_mode() != api_replay.API_REPLAY_RECORD:
+        header = {'If-None-Match': cached_file['etag']}
+    response = github_request('get_repo_file_content', url, headers=header)
+    if response.status_code == 304:
+        api_metrics.increment_counter('github.cache_hits')
+        return cached_file['content']
+    api_metrics.increment_counter('github.cache_misses')
     response_json = response.json()
     file_content = response_json['content']
     file_content_encoding = response_json.get('encoding')
     if file_content_encoding == 'base64':
         file_content = base64.b64decode(file_content).decode()
+    with _github_cache_lock:
+        get_github_cache()[cache_key] = {'etag': response.headers.get('ETag'), 'content': file_content}
+        save_github_cache()
     return file_content
 
 
+def get_repo_yaml_file(username, repo_name, file_name):
+    """
+    This function will return the content of the YAML file from the repo, and the parsed YAML. The file content is
+    cached, see get_repo_file_content, the YAML is parsed for each run
+    :param username: GitHub username
+    :param repo_name: GitHub repo
+    :param file_name: file name
+    :return: file content, parsed YAML
+    """
+    file_content = get_repo_file_content(username, repo_name, file_name)
+    return file_content, yaml.safe_load(file_content)
+
+
 def get_repo_commits(username, repo_name):
     """
     This function will return the repo's commits SHA
     :param: username: repo owner
     :param: repo_name: repository name
-    :return: SHA list
+    :return: generator of commits SHA, newest first
     """
     url = GITHUB_URL + '/repos/' + username + '/' + repo_name + '/commits'
-    header = {'Accept': 'application/vnd.github+json', 'Authorization': 'token ' + GITHUB_TOKEN}
-    response = requests.get(url, headers=header, verify=True)
-    response_json = response.json()
-    sha_list = []
-    for commit in response_json:
-        sha_list.append(commit['sha'])
-    return sha_list
+    for commit in get_pages('get_repo_commits', url):
+        yield commit['sha']
+
+
+def get_commit_info(commit):
+    """
+    This function will return the commit details used by the commits history
+    :param commit: commit, as returned by the GitHub commits APIs
+    :return: commit info, {'sha': ..., 'date': ..., 'message': ..., 'url': ..., 'author': ...}
+    """
+    return {'sha': commit['sha'], 'date': commit['commit']['author']['date'], 'message': commit['commit']['message'],
+            'url': commit['html_url'], 'author': commit['commit']['author']['email']}
 
 
 def get_repo_commit_sha(username, repo_name, sha):
     """
-    This function will return commits details: author, message, date, file
+    This function will return commits details: author, message, date, and all the changed files with their diff.
+    The commits are immutable, the details are cached by SHA, and each commit is collected only once. The changed
+    files of the large commits are collected from all the files pages, up to 3000 files
     :param: username: repo owner
     :param: repo_name: repository name
     :param: sha: commit SHA
-    :return: commits details
+    :return: commits details, 'filename' and 'diff' are the first changed file, 'files' are all the changed files
     """
+    cache_key = username + '/' + repo_name + '/' + sha
+    with _commit_cache_lock:
+        commit_info = _commit_cache.get(cache_key)
+    if commit_info is not None:
+        api_metrics.increment_counter('github.commit_cache_hits')
+        return commit_info
     url = GITHUB_URL + '/repos/' + username + '/' + repo_name + '/commits/' + sha
-    header = {'Accept': 'application/vnd.github+json', 'Authorization': 'token ' + GITHUB_TOKEN}
-    response = requests.get(url, headers=header, verify=True)
+    response = github_request('get_repo_commit_sha', url)
     response_json = response.json()
-    commit_author = response_json['commit']['author']['email']
-    commit_date = response_json['commit']['author']['date']
-    commit_message = response_json['commit']['message']
-    commit_file = response_json['files'][0]['filename']
-    commit_url = response_json['html_url']
-    commit_diff = response_json['files'][0]['patch']
-    commit_info = {'filename': commit_file, 'date': commit_date, 'message': commit_message, 'url': commit_url,
-                   'author': commit_author, 'diff': commit_diff}
+    commit_info = get_commit_info(response_json)
+    files = list(response_json['files'])
+
+    # the commits with more than 300 changed files return the next files pages, linked from the "Link" header
+    next_url = response.links.get('next', {}).get('url')
+    while next_url:
+        response = github_request('get_repo_commit_sha', next_url)
+        files.extend(response.json()['files'])
+        next_url = response.links.get('next', {}).get('url')
+    commit_info['files'] = [{'filename': file['filename'], 'status': file['status'], 'diff': file.get('patch')}
+                            for file in files]
+    if commit_info['files']:
+        commit_info['filename'] = commit_info['files'][0]['filename']
+        commit_info['diff'] = commit_info['files'][0]['diff']
+    with _commit_cache_lock:
+        _commit_cache[cache_key] = commit_info
     return commit_info
 
 
+def get_repo_file_history(username, repo_name, file_name, diffs=False):
+    """
+    This function will return the commits history of a file, newest first. The commits for the file are collected
+    in bulk, 100 commits for each API call. The diffs require one API call for each commit, they are collected
+    only if requested, concurrently
+    :param username: repo owner
+    :param repo_name: repository name
+    :param file_name: file path in the repo
+    :param diffs: True to collect the changed files and the diffs for each commit
+    :return: list of commits info, see get_commit_info, with 'files' if diffs are requested
+    """
+    url = GITHUB_URL + '/repos/' + username + '/' + repo_name + '/commits'
+    commits = [get_commit_info(commit) for commit in get_pages('get_repo_commits', url, params={'path': file_name})]
+    if not diffs or not commits:
+        return commits
+
+    def get_commit_files(commit):
+        return get_repo_commit_sha(username, repo_name, commit['sha'])['files']
+
+    with ThreadPoolExecutor(max_workers=max(1, GITHUB_MAX_WORKERS)) as executor:
+        for commit, files in zip(commits, executor.map(get_commit_files, commits)):
+            commit['files'] = files
+    return commits
+
+
+def get_github_repo(github_repo):
+    """
+    This function will return the PyGithub repo object. The GitHub client and the repo objects are created once,
+    and reused by all the push calls
+    :param github_repo: GitHub repo name, owned by GITHUB_USERNAME
+    :return: PyGithub repo object
+    """
+    global _github_client
+    with _github_client_lock:
+        if _github_client is None:
+            # authenticate to GitHub
+            _github_client = Github(GITHUB_USERNAME, GITHUB_TOKEN)
+        repo = _github_repos.get(github_repo)
+        if repo is None:
+            # searching for my repository
+            repo = _github_client.get_repo(GITHUB_USERNAME + '/' + github_repo)
+            _github_repos[github_repo] = repo
+        return repo
+
+
 def github_push(github_repo, filename, message, content, update=False):
     """
     This function will create or update a file in a GitHub repo
@@ -163,11 +415,7 @@ def github_push(github_repo, filename, message, content, update=False):
     :param update: True if file update, False if create new file
     :return:
     """
-    # authenticate to GitHub
-    g = Github(GITHUB_USERNAME, GITHUB_TOKEN)
-
-    # searching for my repository
-    repo = g.get_repo(GITHUB_USERNAME + '/' + github_repo)
+    repo = get_github_repo(github_repo)
 
     if update:
         # retrieve existing file to get the sha
@@ -177,3 +425,29 @@ def github_push(github_repo, filename, message, content, update=False):
     else:
         # create new file
         repo.create_file(filename, message, content, branch="main")
+
+
+def github_push_files(github_repo, files, message, branch='main'):
+    """
+    This function will create or update multiple files in a GitHub repo with one commit, using the Git Data API:
+    one tree with all the files is created on top of the branch head, one commit, and the branch is updated.
+    The number of API calls does not depend on the number of files
+    :param github_repo: GitHub repo to be updated
+    :param files: files to push, {file path in the repo: file content}
+    :param message: commit message
+    :param branch: branch name
+    :return: commit SHA, None if there are no files or no changes to commit
+    """
+    if not files:
+        return None
+    repo = get_github_repo(github_repo)
+    branch_ref = repo.get_git_ref('heads/' + branch)
+    head_commit = repo.get_git_commit(branch_ref.object.sha)
+    tree_elements = [InputGitTreeElement(path, '100644', 'blob', content=content)
+                     for path, content in files.items()]
+    tree = repo.create_git_tree(tree_elements, head_commit.tree)
+    if tree.sha == head_commit.tree.sha:
+        return None
+    commit = repo.create_git_commit(message, tree, [head_commit])
+    branch_ref.edit(commit.sha)
+    return commit.sha
@@ -20,17 +20,19 @@ __version__ = "0.1.0"
 __copyright__ = "Copyright (c) 2023 Cisco and/or its affiliates."
 __license__ = "Cisco Sample Code License, Version 1.1"
 
+import fnmatch
+import functools
 import json
 import logging
 import os
 import time
 from datetime import datetime
 
-import yaml
-from dnacentersdk import DNACenterAPI
 from dotenv import load_dotenv
 from requests.auth import HTTPBasicAuth  # for Basic Auth
 
+import api_metrics
+import catalyst_center_apis
 import github_apis
 
 load_dotenv('environment.env')
@@ -45,6 +47,25 @@ GITHUB_REPO = os.getenv('GITHUB_REPO')
 
 NETWORK_STATE_PATH = 'network_settings/'
 
+CATALYST_CENTER_MAX_WORKERS = int(os.getenv('CATALYST_CENTER_MAX_WORKERS', '8'))  # max concurrent API calls
+
+# network settings rules: the intent (section, key), the site network settings (instanceType, key) to validate,
+# and the rule type: "value" if the intent value is configured, "enabled" if the settings are configured or not
+NETWORK_SETTINGS_RULES = [
+    {'name': 'dns', 'intent': ('dns_server', 'server_ip'), 'settings': [('dns', 'dns.server')], 'type': 'value'},
+    {'name': 'ntp', 'intent': ('ntp_server', 'server_ip'), 'settings': [('ip', 'ntp.server')], 'type': 'value'},
+    {'name': 'banner', 'intent': ('banner', 'message'), 'settings': [('banner', 'device.banner')], 'type': 'value'},
+    {'name': 'syslog', 'intent': ('syslog', 'syslog_enabled'), 'settings': [('ip', 'syslog.server')],
+     'type': 'enabled'},
+    {'name': 'snmp', 'intent': ('snmp', 'snmp_enabled'), 'settings': [('ip', 'snmp.trap.receiver')],
+     'type': 'enabled'},
+    {'name': 'netflow', 'intent': ('netflow', 'netflow_enabled'), 'settings': [('netflow', 'netflow.collector')],
+     'type': 'enabled'},
+    {'name': 'telemetry', 'intent': ('telemetry', 'telemetry_enabled'),
+     'settings': [('ip', 'syslog.server'), ('ip', 'snmp.trap.receiver'), ('netflow', 'netflow.collector')],
+     'type': 'enabled'}
+]
+
 os.environ['TZ'] = 'America/Los_Angeles'  # define the timezone for PST
 time.tzset()  # adjust the timezone, more info https://help.pythonanywhere.com/pages/SettingTheTimezone/
 
@@ -52,14 +73,288 @@ CATALYST_CENTER_AUTH = HTTPBasicAuth(CATALYST_CENTER_USER, CATALYST_CENTER_PASS)
 FILE_NAME = 'intent_network_settings.yaml'
 
 
+def get_matching_sites(site_list, site_name_hierarchy):
+    """
+    This function will return the sites matching the site name hierarchy
+    :param site_list: site list, see catalyst_center_apis.get_site_list
+    :param site_name_hierarchy: site name hierarchy, or list of site name hierarchies. Shell-style patterns may be used,
+                                for example "Global/OR/*"
+    :return: list of matching sites
+    """
+    if isinstance(site_name_hierarchy, str):
+        site_name_hierarchy = [site_name_hierarchy]
+    sites = []
+    for site in site_list:
+        if any(fnmatch.fnmatchcase(site['siteNameHierarchy'], pattern) for pattern in site_name_hierarchy):
+            sites.append(site)
+    for pattern in site_name_hierarchy:
+        if not any(fnmatch.fnmatchcase(site['siteNameHierarchy'], pattern) for site in sites):
+            logging.info(' Site "' + pattern + '" not found!')
+    return sites
+
+
+def get_site_type(site):
+    """
+    This function will return the site type: "area", "building" or "floor"
+    :param site: site, as returned by the site API
+    :return: site type, None if not available
+    """
+    for info in site.get('additionalInfo') or []:
+        if info.get('nameSpace') == 'Location':
+            return (info.get('attributes') or {}).get('type')
+    return None
+
+
+def get_site_tree(site_list):
+    """
+    This function will create the site hierarchy tree, indexed by site id
+    :param site_list: site list, see catalyst_center_apis.get_site_list
+    :return: {site_id: {'name': ..., 'type': ..., 'parent_id': ..., 'children': [site ids]}}
+    """
+    site_tree = {}
+    for site in site_list:
+        site_tree[site['id']] = {'name': site['siteNameHierarchy'], 'type': get_site_type(site),
+                                 'parent_id': site.get('parentId'), 'children': []}
+    for site_id, node in site_tree.items():
+        if node['parent_id'] in site_tree:
+            site_tree[node['parent_id']]['children'].append(site_id)
+    return site_tree
+
+
+def get_settings_site_id(site_tree, site_id):
+    """
+    This function will return the site that owns the network settings for the site. The network settings are not
+    configured at floor level, the floors inherit the settings from the parent building
+    :param site_tree: site hierarchy tree, see get_site_tree
+    :param site_id: site id
+    :return: site id of the site owning the network settings
+    """
+    while site_tree[site_id]['type'] == 'floor' and site_tree[site_id]['parent_id'] in site_tree:
+        site_id = site_tree[site_id]['parent_id']
+    return site_id
+
+
+def get_inherited_from(site_network_settings, site_id):
+    """
+    This function will return the name of the parent site the network settings are inherited from, if all the
+    settings are inherited from the same parent site
+    :param site_network_settings: site network settings
+    :param site_id: site id
+    :return: parent site name, or None if any setting is configured at the site or inherited from different sites
+    """
+    inherited_groups = {(item.get('inheritedGroupUuid'), item.get('inheritedGroupName'))
+                        for item in site_network_settings}
+    if len(inherited_groups) == 1:
+        group_id, group_name = inherited_groups.pop()
+        if group_id and group_id != site_id:
+            return group_name
+    return None
+
+
+def get_site_network_settings(catalyst_center_api, site_id):
+    """
+    This function will return the network settings for the site
+    :param catalyst_center_api: Catalyst Center SDK connection object
+    :param site_id: site id
+    :return: site network settings
+    """
+    response = catalyst_center_api.network_settings.get_network_v2(site_id)
+    return response['response']
+
+
+def get_setting_values(item):
+    """
+    This function will return the configured values for a network setting, for example the NTP servers
+    :param item: network setting
+    :return: list of configured values
+    """
+    values = []
+    for value in item.get('value') or []:
+        if isinstance(value, dict):
+            if 'primaryIpAddress' in value:
+                values.extend([value.get('primaryIpAddress'), value.get('secondaryIpAddress')])
+            elif 'bannerMessage' in value:
+                values.append(value.get('bannerMessage'))
+            elif 'ipAddress' in value:
+                values.append(value.get('ipAddress'))
+            else:
+                values.extend(value.get('ipAddresses') or [])
+                if value.get('configureDnacIP'):
+                    values.append('Catalyst Center')
+        else:
+            values.append(value)
+    return [value for value in values if value]
+
+
+def index_network_settings(site_network_settings):
+    """
+    This function will index the site network settings by (instanceType, key)
+    :param site_network_settings: site network settings
+    :return: {(instanceType, key): network setting}
+    """
+    return {(item['instanceType'], item['key']): item for item in site_network_settings}
+
+
+def get_site_compliance(site_network_settings, intent_config):
+    """
+    This function will verify the site network settings against the intent, using the network settings rules.
+    The site network settings are indexed once, each rule is a lookup in the index
+    :param site_network_settings: site network settings
+    :param intent_config: intent config, parsed from the intent YAML file
+    :return: site compliance status
+    """
+    settings_index = index_network_settings(site_network_settings)
+    site_report = {}
+    for rule in NETWORK_SETTINGS_RULES:
+        intent_section, intent_key = rule['intent']
+        if intent_key not in (intent_config.get(intent_section) or {}):
+            continue
+        intent_value = intent_config[intent_section][intent_key]
+
+        settings = [settings_index.get(setting) for setting in rule['settings']]
+        if rule['type'] == 'enabled':
+            configured = all(item is not None and get_setting_values(item) for item in settings)
+            compliant = configured == bool(intent_value)
+        else:
+            configured = get_setting_values(settings[0]) if settings[0] is not None else []
+            compliant = intent_value in configured
+            configured = configured[0] if len(configured) == 1 else (configured or None)
+
+        if compliant:
+            site_report.update({rule['name']: 'compliant'})
+        else:
+            site_report.update({rule['name']: 'not_compliant'})
+            site_report.update({rule['name'] + '_intent': intent_value})
+            site_report.update({rule['name'] + '_configured': configured})
+    return site_report
+
+
+def is_site_compliant(site_report):
+    """
+    This function will verify if all the site network settings are compliant
+    :param site_report: site compliance status
+    :return: True or False
+    """
+    return 'error' not in site_report and 'not_compliant' not in site_report.values()
+
+
+def get_intent_config():
+    """
+    This function will return the network settings intent from GitHub, and it will log the intent settings
+    :return: intent config, parsed from the intent YAML file
+    """
+    _, intent_config = github_apis.get_repo_yaml_file(username=GITHUB_USERNAME, repo_name=GITHUB_REPO,
+                                                      file_name=FILE_NAME)
+    logging.info(' File "' + FILE_NAME + '" found!')
+
+    # parse the input data
+    site_name_hierarchy = intent_config['site_info']['site_name_hierarchy']
+
+    logging.info(' Intent network settings from GitHub:')
+    if isinstance(site_name_hierarchy, str):
+        logging.info('   Site hierarchy: ' + site_name_hierarchy)
+    else:
+        logging.info('   Site hierarchy: ' + ', '.join(site_name_hierarchy))
+    for rule in NETWORK_SETTINGS_RULES:
+        intent_section, intent_key = rule['intent']
+        if intent_key in (intent_config.get(intent_section) or {}):
+            logging.info('   ' + intent_section + ' ' + intent_key + ': ' + str(intent_config[intent_section][intent_key]))
+
+    return intent_config
+
+
+def run_network_settings_compliance(catalyst_center_api, intent_config, site_list=None):
+    """
+    This function will validate the network settings for the sites matching the intent, and it will save the
+    network settings report. The site list may be collected once by the caller, and shared with other compliance
+    checks
+    :param catalyst_center_api: Catalyst Center SDK connection object
+    :param intent_config: intent config, see get_intent_config
+    :param site_list: optional site list, see catalyst_center_apis.get_site_list
+    :return: network settings report
+    """
+    site_name_hierarchy = intent_config['site_info']['site_name_hierarchy']
+
+    # get the site Id for all the sites matching the site hierarchy, from one site list
+    if site_list is None:
+        site_list = catalyst_center_apis.get_site_list(catalyst_center_api)
+    with api_metrics.span('network_settings_compliance.match_sites'):
+        sites = get_matching_sites(site_list, site_name_hierarchy)
+    logging.info(' Number of sites matching the site hierarchy: ' + str(len(sites)))
+
+    # the floors inherit the network settings from the building, the settings are collected once for each building
+    with api_metrics.span('network_settings_compliance.site_tree'):
+        site_tree = get_site_tree(site_list)
+        settings_site_ids = {}
+        for site in sites:
+            settings_site_ids[site['id']] = get_settings_site_id(site_tree, site['id'])
+        settings_sites = list(dict.fromkeys(settings_site_ids.values()))
+    logging.info(' Number of sites with network settings to collect: ' + str(len(settings_sites)))
+    api_metrics.increment_counter('network_settings_compliance.sites_processed', len(sites))
+    api_metrics.increment_counter('network_settings_compliance.inherited_settings_hits',
+                                  len(sites) - len(settings_sites))
+
+    # collect the network settings for each site once, concurrently, and verify the settings for each site once
+    settings_cache = {}
+    sites_status = {}
+    sites_network_settings = catalyst_center_apis.run_concurrently_as_completed(
+        functools.partial(get_site_network_settings, catalyst_center_api), settings_sites,
+        CATALYST_CENTER_MAX_WORKERS)
+    for site_id, site_network_settings, error in sites_network_settings:
+        if error is not None:
+            logging.info(' Unable to collect the site settings for "' + site_tree[site_id]['name'] + '": ' + str(error))
+            sites_status[site_id] = {'error': str(error)}
+        else:
+            settings_cache[site_id] = site_network_settings
+            with api_metrics.span('network_settings_compliance.site_compliance'):
+                sites_status[site_id] = get_site_compliance(site_network_settings, intent_config)
+    logging.info(' Collected the site settings')
+
+    sites_report = []
+    for site in sites:
+        settings_site_id = settings_site_ids[site['id']]
+        site_report = {'site_hierarchy': site['siteNameHierarchy'], 'compliance_status': sites_status[settings_site_id]}
+        if settings_site_id != site['id']:
+            site_report.update({'inherited_from': site_tree[settings_site_id]['name']})
+        elif settings_site_id in settings_cache:
+            inherited_from = get_inherited_from(settings_cache[settings_site_id], settings_site_id)
+            if inherited_from:
+                site_report.update({'inherited_from': inherited_from})
+        sites_report.append(site_report)
+
+    error_sites = [item for item in sites_report if 'error' in item['compliance_status']]
+    compliant_sites = [item for item in sites_report if is_site_compliant(item['compliance_status'])]
+    network_settings_report = {'summary': {'sites': len(sites_report), 'compliant': len(compliant_sites),
+                                           'not_compliant': len(sites_report) - len(compliant_sites) -
+                                           len(error_sites),
+                                           'errors': len(error_sites)},
+                               'sites': sites_report}
+
+    logging.info(' Network Settings compliance report:')
+    logging.info('   ' + json.dumps(network_settings_report, indent=4))
+
+    # save report to JSON formatted file
+    with open('network_settings_report.json', 'w') as f:
+        f.write(json.dumps(network_settings_report, indent=4))
+    logging.info(' Saved the network settings report to file "network_settings_report.json"')
+
+    return network_settings_report
+
+
 def main():
     """
-    This app will pull network settings file from GitHub and identify if the specified site is configured with the defined
-    network settings. This validation could be performed for all sites.
+    This app will pull network settings file from GitHub and identify if the specified sites are configured with the
+    defined network settings. This validation could be performed for all sites.
+    The site name hierarchy may be a site, a list of sites, or shell-style patterns matching multiple sites.
+    Each intent section is optional, telemetry is enabled when the syslog, SNMP trap and NetFlow collectors are
+    configured. The network settings are collected and validated once for each site that owns them, the floors are resolved
+    from the parent building settings.
     Example:
         ---
         site_info:
-          site_name_hierarchy: Global/OR/PDX
+          site_name_hierarchy:
+            - Global/OR/PDX
+            - Global/NY/*
 
         banner:
           message: This device is managed by Catalyst Center 10.93.141.45, version 2.3.7.3
@@ -73,6 +368,9 @@ def main():
         telemetry:
           telemetry_enabled: true
 
+        snmp:
+          snmp_enabled: true
+
         ntp_server:
           server_ip: 171.68.38.66
 
@@ -89,91 +387,23 @@ def main():
     current_time = str(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
     logging.info(' Application "network_settings_compliance.py" Start, ' + current_time)
 
-    # get all repos for user
-    repos = github_apis.get_private_repos(username=GITHUB_USERNAME, github_token=GITHUB_TOKEN)
-
     # verify if repo exists
-    if GITHUB_REPO not in repos:
+    if github_apis.get_repo(username=GITHUB_USERNAME, repo_name=GITHUB_REPO) is None:
         logging.info(' Repo "' + GITHUB_REPO + '" not found!')
         return
     logging.info(' Repo "' + GITHUB_REPO + '" found!')
 
     # get the network settings intent file
-    intent_network_settings = github_apis.get_repo_file_content(username=GITHUB_USERNAME, repo_name=GITHUB_REPO,
-                                                                file_name=FILE_NAME)
-    logging.info(' File "' + FILE_NAME + '" found!')
-
-    # decode the YAMl file
-    intent_config = yaml.safe_load(intent_network_settings)
-
-    # parse the input data
-    site_name_hierarchy = intent_config['site_info']['site_name_hierarchy']
-    banner_message = intent_config['banner']['message']
-    ntp_server = intent_config['ntp_server']['server_ip']
-    dns_server = intent_config['dns_server']['server_ip']
-
-    logging.info(' Intent network settings from GitHub:')
-    logging.info('   Site hierarchy: ' + site_name_hierarchy)
-    logging.info('   Banner: ' + banner_message)
-    logging.info('   NTP server: ' + ntp_server)
-    logging.info('   DNS server: ' + dns_server)
+    intent_config = get_intent_config()
 
     # create a DNACenterAPI "Connection Object" to use the Python SDK
-    catalyst_center_api = DNACenterAPI(username=CATALYST_CENTER_USER, password=CATALYST_CENTER_PASS,
-                                       base_url=CATALYST_CENTER_URL, version='2.3.5.3',
-                                       verify=False)
-
-    # get the site Id for the site with the name
-    response = catalyst_center_api.sites.get_site(name=site_name_hierarchy)
-    site_id = response['response'][0]['id']
-    logging.info(' The site id for the site: "' + site_name_hierarchy + '" is: ' + site_id)
-
-    # collect the network settings for site
-    response = catalyst_center_api.network_settings.get_network_v2(site_id)
-    site_network_settings = response['response']
-    logging.info(' Collected the site settings')
-
-    # verify the settings for NTP
-    for item in site_network_settings:
-        if item['instanceType'] == 'ip' and item['key'] == 'ntp.server' and item['value'][0] != ntp_server:
-            network_settings_ntp_status = ({'ntp': 'not_compliant'})
-            network_settings_ntp_status.update({'ntp_intent': ntp_server})
-            network_settings_ntp_status.update({'ntp_configured': item['value'][0]})
-            break
-        else:
-            network_settings_ntp_status = {'ntp': 'compliant'}
-
-    # verify the settings for DNS
-    for item in site_network_settings:
-        if item['instanceType'] == 'dns' and item['key'] == 'dns.server' and item['value'][0]['primaryIpAddress'] != dns_server:
-            network_settings_dns_status = {'dns': 'not_compliant'}
-            network_settings_dns_status.update({'dns_intent': dns_server})
-            network_settings_dns_status.update({'dns_configured': item['value'][0]['primaryIpAddress']})
-            break
-        else:
-            network_settings_dns_status = {'dns': 'compliant'}
-
-    # verify the settings for Banner message
-    for item in site_network_settings:
-        if item['instanceType'] == 'banner' and item['value'][0]['bannerMessage'] != banner_message:
-            network_settings_banner_status = {'banner': 'not_compliant'}
-            network_settings_banner_status.update({'banner_intent': banner_message})
-            network_settings_banner_status.update({'banner_configured': item['value'][0]['bannerMessage']})
-            break
-        else:
-            network_settings_banner_status = {'banner': 'compliant'}
-
-    # merge the compliance reports for each network settings
-    site_report = {**network_settings_dns_status, **network_settings_ntp_status, **network_settings_banner_status}
-    network_settings_report = {'site_hierarchy': site_name_hierarchy, 'compliance_status': site_report}
+    catalyst_center_api = catalyst_center_apis.get_catalyst_center_api(CATALYST_CENTER_URL, CATALYST_CENTER_USER,
+                                                                        CATALYST_CENTER_PASS)
 
-    logging.info(' Network Settings compliance report:')
-    logging.info('   ' + json.dumps(network_settings_report, indent=4))
+    run_network_settings_compliance(catalyst_center_api, intent_config)
 
-    # save report to JSON formatted file
-    with open('network_settings_report.json', 'w') as f:
-        f.write(json.dumps(network_settings_report, indent=4))
-    logging.info(' Saved the network settings report to file "network_settings_report.json"')
+    api_metrics.log_api_metrics()
+    api_metrics.export_metrics()
 
     date_time = str(datetime.now().replace(microsecond=0))
     logging.info(' End of Application "network_settings_compliance.py" Run: ' + date_time)
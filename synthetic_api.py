@@ -0,0 +1,334 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2023 Cisco and/or its affiliates.
+This software is licensed to you under the terms of the Cisco Sample
+Code License, Version 1.1 (the "License"). You may obtain a copy of the
+License at
+               https://developer.cisco.com/docs/licenses
+All use of the material herein must be in accordance with the terms of
+the License. All rights not expressly granted by the License are
+reserved. Unless required by applicable law or agreed to separately in
+writing, software distributed under the License is distributed on an "AS
+IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express
+or implied.
+"""
+
+__author__ = "Gabriel Zapodeanu TME, ENB"
+__email__ = "gzapodea@cisco.com"
+__version__ = "0.1.0"
+__copyright__ = "Copyright (c) 2023 Cisco and/or its affiliates."
+__license__ = "Cisco Sample Code License, Version 1.1"
+
+import functools
+import os
+import random
+import time
+from types import SimpleNamespace
+
+from dnacentersdk.models.mydict import MyDict
+
+SYNTHETIC_DEVICES = 10000  # default number of devices in the synthetic inventory
+SYNTHETIC_CONFIG_LINES = 300  # default number of running config lines for each device
+DEVICES_PER_BUILDING = 100
+FLOORS_PER_BUILDING = 2
+BUILDINGS_PER_AREA = 10
+AP_EVERY = 20  # one of every 20 devices is an access point
+COMPLIANCE_TYPES = ['PSIRT', 'EOX', 'IMAGE', 'RUNNING_CONFIG', 'NETWORK_SETTINGS']
+
+DEVICE_CONFIG_INTENT = """---
+policies:
+  - device_filter:
+      device_role: ACCESS
+    rule_groups: [aaa_config, ntp_config, logging_config]
+  - device_filter:
+      device_role: CORE
+    rule_groups: [aaa_config]
+
+aaa_config:
+  commands: |
+    aaa new-model
+    aaa authentication login default local
+
+ntp_config:
+  commands: |
+    ntp source Loopback1
+    ntp server 171.68.38.66
+
+logging_config:
+  commands: |
+    logging host 10.10.10.10
+"""
+
+NETWORK_SETTINGS_INTENT = """---
+site_info:
+  site_name_hierarchy: Global/*
+
+banner:
+  message: This device is managed by Catalyst Center
+
+netflow:
+  netflow_enabled: true
+
+syslog:
+  syslog_enabled: true
+
+ntp_server:
+  server_ip: 171.68.38.66
+
+dns_server:
+  server_ip: 171.70.168.183
+"""
+
+GITHUB_FILES = {'custom_network_compliance.yaml': DEVICE_CONFIG_INTENT,
+                'intent_network_settings.yaml': NETWORK_SETTINGS_INTENT}
+
+
+def generate_config(config_lines, seed=0):
+    """
+    This function will generate a synthetic running config, with global commands and interface sections
+    :param config_lines: approximate number of config lines
+    :param seed: random seed, to generate the same config for each run
+    :return: config text
+    """
+    rnd = random.Random(seed)
+    lines = ['hostname BENCH-CORE', 'aaa new-model', 'aaa authentication login default local',
+             'ntp source Loopback1', 'ntp server 171.68.38.66']
+    interface = 0
+    while len(lines) < config_lines:
+        if rnd.random() < 0.8:
+            lines.append('interface TenGigabitEthernet1/0/' + str(interface))
+            lines.append(' description BENCH link ' + str(interface))
+            lines.append(' switchport mode trunk')
+            lines.append(' switchport trunk allowed vlan ' + str(rnd.randint(1, 4094)))
+            lines.append('!')
+            interface += 1
+        else:
+            lines.append('access-list ' + str(rnd.randint(100, 199)) + ' permit ip host 10.' + str(rnd.randint(0, 255))
+                         + '.' + str(rnd.randint(0, 255)) + '.1 any')
+    return '\n'.join(lines) + '\n'
+
+
+def generate_intent(intent_commands, seed=0):
+    """
+    This function will generate the intent commands, half of them configured in the synthetic running config
+    :param intent_commands: number of intent commands
+    :param seed: random seed
+    :return: intent commands text
+    """
+    rnd = random.Random(seed)
+    commands = ['aaa new-model', 'aaa authentication login default local', 'ntp source Loopback1',
+                'ntp server 171.68.38.66']
+    while len(commands) < intent_commands:
+        commands.append('logging host 10.10.' + str(rnd.randint(0, 255)) + '.' + str(rnd.randint(0, 255)))
+    return '\n'.join(commands[:intent_commands]) + '\n'
+
+
+def get_device_id(index):
+    """
+    This function will return the synthetic device id
+    :param index: device index
+    :return: device id
+    """
+    return 'device-' + str(index).zfill(6)
+
+
+def get_device_index(device_id):
+    """
+    This function will return the device index from the synthetic device id
+    :param device_id: device id
+    :return: device index
+    """
+    return int(device_id.split('-')[-1])
+
+
+def get_device(index):
+    """
+    This function will return the synthetic device, with the fields returned by the device list API
+    :param index: device index
+    :return: device
+    """
+    if index % AP_EVERY == AP_EVERY - 1:
+        role, family, device_type = 'ACCESS', 'Unified AP', 'Cisco Catalyst 9130AXI Unified Access Point'
+    elif index % 10 == 9:
+        role, family, device_type = 'CORE', 'Switches and Hubs', 'Cisco Catalyst 9500 Switch'
+    elif index % 10 >= 7:
+        role, family, device_type = 'DISTRIBUTION', 'Switches and Hubs', 'Cisco Catalyst 9400 Switch'
+    else:
+        role, family, device_type = 'ACCESS', 'Switches and Hubs', 'Cisco Catalyst 9300 Switch'
+    return MyDict({'id': get_device_id(index), 'hostname': 'SYN-' + role[:4] + '-' + str(index),
+                   'role': role, 'family': family, 'type': device_type,
+                   'managementIpAddress': '10.' + str(index // 65536 % 256) + '.' + str(index // 256 % 256) + '.' +
+                                          str(index % 256),
+                   'softwareVersion': '17.9.4', 'lastUpdateTime': 1700000000000})
+
+
+def get_site_list(devices):
+    """
+    This function will return the synthetic site hierarchy: areas, buildings with up to 100 devices, and floors
+    :param devices: number of devices
+    :return: site list, with the fields returned by the site API
+    """
+    site_list = [{'id': 'site-global', 'siteNameHierarchy': 'Global', 'parentId': None}]
+    buildings = max(1, (devices + DEVICES_PER_BUILDING - 1) // DEVICES_PER_BUILDING)
+    for building in range(buildings):
+        area = building // BUILDINGS_PER_AREA
+        area_name = 'Global/Area-' + str(area)
+        if building % BUILDINGS_PER_AREA == 0:
+            site_list.append({'id': 'site-area-' + str(area), 'siteNameHierarchy': area_name,
+                              'parentId': 'site-global',
+                              'additionalInfo': [{'nameSpace': 'Location', 'attributes': {'type': 'area'}}]})
+        building_name = area_name + '/Building-' + str(building)
+        site_list.append({'id': 'site-building-' + str(building), 'siteNameHierarchy': building_name,
+                          'parentId': 'site-area-' + str(area),
+                          'additionalInfo': [{'nameSpace': 'Location', 'attributes': {'type': 'building'}}]})
+        for floor in range(FLOORS_PER_BUILDING):
+            site_list.append({'id': 'site-floor-' + str(building) + '-' + str(floor),
+                              'siteNameHierarchy': building_name + '/Floor-' + str(floor),
+                              'parentId': 'site-building-' + str(building),
+                              'additionalInfo': [{'nameSpace': 'Location', 'attributes': {'type': 'floor'}}]})
+    return [MyDict(site) for site in site_list]
+
+
+def get_device_site(index):
+    """
+    This function will return the floor site id and the site name hierarchy of the synthetic device
+    :param index: device index
+    :return: site id, site name hierarchy
+    """
+    building = index // DEVICES_PER_BUILDING
+    floor = index % FLOORS_PER_BUILDING
+    site_name = ('Global/Area-' + str(building // BUILDINGS_PER_AREA) + '/Building-' + str(building) + '/Floor-' +
+                 str(floor))
+    return 'site-floor-' + str(building) + '-' + str(floor), site_name
+
+
+@functools.lru_cache(maxsize=4)
+def generate_compliance_detail(devices):
+    """
+    This function will return the synthetic compliance details, one for each device and compliance type. The
+    compliance details are generated once for each number of devices, the callers must not modify them
+    :param devices: number of devices
+    :return: compliance details, with the fields returned by the compliance API
+    """
+    compliance_detail = []
+    for index in range(devices):
+        for type_index, compliance_type in enumerate(COMPLIANCE_TYPES):
+            status = 'NON_COMPLIANT' if (index + type_index) % 9 == 0 else 'COMPLIANT'
+            compliance_detail.append({'deviceUuid': get_device_id(index), 'complianceType': compliance_type,
+                                      'status': status})
+    return compliance_detail
+
+
+def get_network_settings(site_id):
+    """
+    This function will return the synthetic network settings of a site. One of every 7 buildings has no NetFlow
+    collector, and one of every 11 buildings has a different NTP server
+    :param site_id: site id
+    :return: site network settings, with the fields returned by the network settings API
+    """
+    site_number = sum(ord(character) for character in site_id)
+    ntp_server = '171.68.48.78' if site_number % 11 == 0 else '171.68.38.66'
+    settings = [
+        {'instanceType': 'dns', 'key': 'dns.server', 'inheritedGroupUuid': 'site-global',
+         'inheritedGroupName': 'Global', 'value': [{'domainName': 'cisco.com', 'primaryIpAddress': '171.70.168.183',
+                                                    'secondaryIpAddress': '171.70.168.184'}]},
+        {'instanceType': 'ip', 'key': 'ntp.server', 'inheritedGroupUuid': 'site-global',
+         'inheritedGroupName': 'Global', 'value': [ntp_server]},
+        {'instanceType': 'banner', 'key': 'device.banner', 'inheritedGroupUuid': 'site-global',
+         'inheritedGroupName': 'Global',
+         'value': [{'bannerMessage': 'This device is managed by Catalyst Center', 'retainExistingBanner': False}]},
+        {'instanceType': 'ip', 'key': 'syslog.server', 'inheritedGroupUuid': 'site-global',
+         'inheritedGroupName': 'Global', 'value': [{'ipAddresses': ['10.93.141.100'], 'configureDnacIP': True}]},
+        {'instanceType': 'ip', 'key': 'snmp.trap.receiver', 'inheritedGroupUuid': 'site-global',
+         'inheritedGroupName': 'Global', 'value': [{'ipAddresses': ['10.93.141.100'], 'configureDnacIP': True}]}]
+    if site_number % 7:
+        settings.append({'instanceType': 'netflow', 'key': 'netflow.collector', 'inheritedGroupUuid': 'site-global',
+                         'inheritedGroupName': 'Global',
+                         'value': [{'ipAddress': '10.93.141.101', 'port': 2055}]})
+    return settings
+
+
+def get_github_file(file_name):
+    """
+    This function will return the synthetic intent file
+    :param file_name: file name
+    :return: file content, None if the file is not a synthetic intent file
+    """
+    return GITHUB_FILES.get(file_name)
+
+
+def get_synthetic_api(devices=None, latency=None, config_lines=None):
+    """
+    This function will return a stand-in for the Catalyst Center SDK connection object, with the API methods used by
+    the compliance apps. The responses are generated for a synthetic inventory, each API call waits for the
+    configured latency. The defaults are read from the SYNTHETIC_DEVICES, SYNTHETIC_LATENCY and
+    SYNTHETIC_CONFIG_LINES environment variables
+    :param devices: number of devices
+    :param latency: latency of each API call, in seconds
+    :param config_lines: number of running config lines for each device
+    :return: synthetic API connection object
+    """
+    devices = devices or int(os.getenv('SYNTHETIC_DEVICES', SYNTHETIC_DEVICES))
+    latency = latency if latency is not None else float(os.getenv('SYNTHETIC_LATENCY', '0'))
+    config_lines = config_lines or int(os.getenv('SYNTHETIC_CONFIG_LINES', SYNTHETIC_CONFIG_LINES))
+    site_list = get_site_list(devices)
+
+    def wait():
+        if latency:
+            time.sleep(latency)
+
+    def get_device_count(**kwargs):
+        wait()
+        return MyDict({'response': devices})
+
+    def get_device_list(offset=1, limit=500, **kwargs):
+        wait()
+        return {'response': [get_device(index) for index in range(offset - 1, min(offset - 1 + limit, devices))]}
+
+    def get_device_by_id(id):
+        wait()
+        return {'response': get_device(get_device_index(id))}
+
+    def get_device_detail(identifier=None, search_by=None, **kwargs):
+        wait()
+        return MyDict({'response': {'location': get_device_site(get_device_index(search_by))[1]}})
+
+    def get_device_config_by_id(network_device_id):
+        wait()
+        return MyDict({'response': generate_config(config_lines, seed=get_device_index(network_device_id))})
+
+    def get_device_role_in_sda_fabric(device_management_ip_address):
+        wait()
+        return MyDict({'roles': ['EDGENODE']})
+
+    def get_compliance_detail(**kwargs):
+        wait()
+        return {'response': generate_compliance_detail(devices)}
+
+    def get_site(offset=1, limit=500, **kwargs):
+        wait()
+        return {'response': site_list[offset - 1:offset - 1 + limit]}
+
+    def get_membership(site_id):
+        wait()
+        if not site_id.startswith('site-floor-'):
+            return MyDict({'device': []})
+        building, floor = (int(item) for item in site_id.split('-')[2:])
+        members = [{'instanceUuid': get_device_id(index)}
+                   for index in range(building * DEVICES_PER_BUILDING + floor,
+                                      min((building + 1) * DEVICES_PER_BUILDING, devices), FLOORS_PER_BUILDING)]
+        return MyDict({'device': [{'siteId': site_id, 'response': members}]})
+
+    def get_network_v2(site_id):
+        wait()
+        return MyDict({'response': get_network_settings(site_id)})
+
+    return SimpleNamespace(
+        devices=SimpleNamespace(get_device_count=get_device_count, get_device_list=get_device_list,
+                                get_device_by_id=get_device_by_id, get_device_detail=get_device_detail,
+                                get_device_config_by_id=get_device_config_by_id),
+        sda=SimpleNamespace(get_device_role_in_sda_fabric=get_device_role_in_sda_fabric),
+        compliance=SimpleNamespace(get_compliance_detail=get_compliance_detail),
+        sites=SimpleNamespace(get_site=get_site, get_membership=get_membership),
+        network_settings=SimpleNamespace(get_network_v2=get_network_v2))